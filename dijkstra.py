@@ -3,14 +3,40 @@ import argparse
 import json
 import math
 import heapq
+from array import array
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional, Iterable, Any
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# scipy y numba dependen de numpy: sin él no se prueban
+csr_matrix = None
+njit = None
+if np is not None:
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+    except ImportError:
+        csr_matrix = None
+    try:
+        from numba import njit
+    except ImportError:
+        njit = None
+
+_INF = math.inf
+_isinf = math.isinf
+
 
 @dataclass
 class Graph:
     adj: Dict[str, Dict[str, float]] = field(default_factory=dict)
     directed: bool = False
+    # Representación CSR congelada (se reconstruye si cambia la topología)
+    _csr: Optional[Tuple[array, array, array, Dict[str, int]]] = field(default=None, init=False, repr=False, compare=False)
+    id_to_name: Tuple[str, ...] = field(default=(), init=False, repr=False, compare=False)
 
     def add_edge(self, u: str, v: str, w: float = 1.0) -> None:
         self.adj.setdefault(u, {})
@@ -18,6 +44,7 @@ class Graph:
         self.adj[u][v] = float(w)
         if not self.directed:
             self.adj[v][u] = float(w)
+        self._csr = None
 
     @classmethod
     def from_topology(cls, topo: Dict[str, Any], directed: bool = False) -> "Graph":
@@ -44,11 +71,129 @@ class Graph:
     def neighbors(self, u: str) -> Dict[str, float]:
         return self.adj.get(u, {})
 
+    def to_csr(self) -> Tuple[array, array, array, Dict[str, int]]:
+        """Devuelve (indptr, indices, weights, name_to_id); los vecinos de u son indices[indptr[u]:indptr[u+1]]."""
+        if self._csr is None:
+            id_to_name = tuple(self.adj.keys())
+            name_to_id = {u: i for i, u in enumerate(id_to_name)}
+            indptr = array("i", [0])
+            indices = array("i")
+            weights = array("d")
+            for u in id_to_name:
+                for v, w in self.adj[u].items():
+                    indices.append(name_to_id[v])
+                    weights.append(w)
+                indptr.append(len(indices))
+            self.id_to_name = id_to_name
+            self._csr = (indptr, indices, weights, name_to_id)
+        return self._csr
+
+
+def _heap_push(keys, vals, size: int, key: float, val: int) -> int:
+    # Heap binario mínimo sobre arreglos paralelos (keys, vals); retorna el nuevo tamaño
+    i = size
+    keys[i] = key
+    vals[i] = val
+    while i > 0:
+        parent = (i - 1) >> 1
+        if keys[parent] <= key:
+            break
+        keys[i] = keys[parent]
+        vals[i] = vals[parent]
+        i = parent
+    keys[i] = key
+    vals[i] = val
+    return size + 1
+
+
+def _heap_pop_min(keys, vals, size: int) -> Tuple[float, int, int]:
+    # Extrae el mínimo; retorna (key, val, nuevo tamaño)
+    top_key = keys[0]
+    top_val = vals[0]
+    size -= 1
+    if size > 0:
+        key = keys[size]
+        val = vals[size]
+        i = 0
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[child + 1] < keys[child]:
+                child += 1
+            if key <= keys[child]:
+                break
+            keys[i] = keys[child]
+            vals[i] = vals[child]
+            i = child
+        keys[i] = key
+        vals[i] = val
+    return top_key, top_val, size
+
+
+def _dijkstra_csr(indptr, indices, weights, src, n):
+    # Kernel numérico para numba: misma lógica que DijkstraRouter.run sobre arreglos CSR
+    dist = np.full(n, np.inf)
+    prev = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    # cada arista se relaja a lo sumo una vez, así que el heap nunca supera M + 1
+    keys = np.empty(len(indices) + 1, dtype=np.float64)
+    vals = np.empty(len(indices) + 1, dtype=np.int64)
+    dist[src] = 0.0
+    size = _heap_push(keys, vals, 0, 0.0, src)
+    while size > 0:
+        d_u, u, size = _heap_pop_min(keys, vals, size)
+        if visited[u]:
+            continue
+        visited[u] = True
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if visited[v]:
+                continue
+            alt = d_u + weights[k]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev[v] = u
+                size = _heap_push(keys, vals, size, alt, v)
+    return dist, prev
+
+
+if njit is not None:
+    _heap_push = njit(cache=True)(_heap_push)
+    _heap_pop_min = njit(cache=True)(_heap_pop_min)
+    _dijkstra_csr = njit(cache=True)(_dijkstra_csr)
+
+
+def _first_hops_vec(pred, src: int):
+    # Pointer jumping sobre el vector de predecesores de scipy (negativo = sin padre):
+    # up[v] sube por el árbol hasta el hijo directo de src en O(log profundidad) pasadas
+    idx = np.arange(len(pred))
+    up = np.where((pred >= 0) & (pred != src), pred, idx)
+    while True:
+        nxt = up[up]
+        if np.array_equal(nxt, up):
+            break
+        up = nxt
+    hop = np.where(pred[up] == src, up, -1)
+    hop[src] = src
+    return hop
+
 
 @dataclass
 class DijkstraResult:
     dist: Dict[str, float]
     prev: Dict[str, Optional[str]]
+    # next-hops ya resueltos por el backend (opcional), válidos solo para `source`
+    source: Optional[str] = field(default=None, repr=False)
+    hops: Optional[Dict[str, Optional[str]]] = field(default=None, repr=False)
+
+    @classmethod
+    def from_arrays(cls, names: Tuple[str, ...], dist: Iterable[float], prev: Iterable[int]) -> "DijkstraResult":
+        # Convierte los vectores indexados por id (prev = -1 sin padre) a dicts por nombre
+        return cls(
+            dist=dict(zip(names, map(float, dist))),
+            prev={u: (names[p] if p >= 0 else None) for u, p in zip(names, prev)},
+        )
 
     def next_hop(self, src: str, dst: str) -> Optional[str]:
         if dst not in self.dist or math.isinf(self.dist[dst]):
@@ -64,59 +209,136 @@ class DijkstraResult:
             parent = self.prev.get(curr)
         return curr if parent == src else None
 
+    def first_hops(self, src: str) -> Dict[str, Optional[str]]:
+        """next_hop(src, dst) para todos los destinos en una sola pasada O(N)."""
+        if self.hops is not None and self.source == src:
+            return self.hops
+        hops: Dict[str, Optional[str]] = {src: src}
+        for v in self.dist:
+            if v in hops:
+                continue
+            # subir por prev hasta el origen o hasta un nodo ya resuelto
+            path = []
+            curr: Optional[str] = v
+            while curr is not None and curr != src and curr not in hops:
+                path.append(curr)
+                curr = self.prev.get(curr)
+            if curr is None:
+                hop = None
+            elif curr == src:
+                hop = path[-1]
+            else:
+                hop = hops[curr]
+            for u in path:
+                hops[u] = hop
+        return hops
+
 
 class DijkstraRouter:
 
     def __init__(self, graph: Graph):
         self.g = graph
+        # Diagnóstico: entradas obsoletas sacadas del heap en la última corrida
+        self.unnecessary_heap_elements = 0
 
-    def run(self, source: str) -> DijkstraResult:
+    def _source_id(self, source: str) -> int:
         if source not in self.g.adj:
             raise ValueError(f"Nodo origen '{source}' no existe en la topología")
+        _, _, weights, name_to_id = self.g.to_csr()
+        if weights and min(weights) < 0:
+            raise ValueError("Dijkstra requiere pesos no negativos")
+        return name_to_id[source]
 
-        dist = {u: math.inf for u in self.g.nodes()}
-        prev = {u: None for u in self.g.nodes()}
-        dist[source] = 0.0
+    def run(self, source: str) -> DijkstraResult:
+        src = self._source_id(source)
+        indptr, indices, weights, _ = self.g.to_csr()
 
-        pq: List[Tuple[float, str]] = [(0.0, source)]  
-        visited = set()
+        if csr_matrix is not None:
+            return self._run_scipy(indptr, indices, weights, src)
+        if njit is not None:
+            names = self.g.id_to_name
+            dist_vec, pred_vec = _dijkstra_csr(np.asarray(indptr), np.asarray(indices), np.asarray(weights), src, len(names))
+            return DijkstraResult.from_arrays(names, dist_vec, pred_vec.tolist())
+        return self._run_python(src)
+
+    def _run_python(self, src: int) -> DijkstraResult:
+        indptr, indices, weights, _ = self.g.to_csr()
+        names = self.g.id_to_name
+        n = len(names)
+
+        dist = array("d", [math.inf]) * n
+        prev = array("i", [-1]) * n
+        dist[src] = 0.0
+
+        # heapq (en C) es más rápido aquí que el heap de arreglos paralelos
+        # (_heap_push/_heap_pop_min), que solo compensa compilado con numba
+        pq: List[Tuple[float, int]] = [(0.0, src)]
+        visited = bytearray(n)
+        stale = 0
 
         while pq:
             d_u, u = heapq.heappop(pq)
-            if u in visited:
+            if visited[u]:
+                stale += 1
                 continue
-            visited.add(u)
+            visited[u] = 1
 
-            if d_u > dist[u]:
-                continue
-
-            for v, w in self.g.neighbors(u).items():
-                if w < 0:
-                    raise ValueError("Dijkstra requiere pesos no negativos")
-                alt = dist[u] + w
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if visited[v]:
+                    continue
+                alt = d_u + weights[k]
                 if alt < dist[v]:
                     dist[v] = alt
                     prev[v] = u
                     heapq.heappush(pq, (alt, v))
 
-        return DijkstraResult(dist=dist, prev=prev)
+        self.unnecessary_heap_elements = stale
+        return DijkstraResult.from_arrays(names, dist, prev)
+
+    def _run_scipy(self, indptr: array, indices: array, weights: array, src: int) -> DijkstraResult:
+        # Mismo algoritmo, pero el bucle principal corre en C (scipy.sparse.csgraph)
+        names = self.g.id_to_name
+        n = len(names)
+        mat = csr_matrix((weights, indices, indptr), shape=(n, n))
+        dist_vec, pred_vec = csgraph_dijkstra(mat, directed=self.g.directed, indices=src, return_predecessors=True)
+        res = DijkstraResult.from_arrays(names, dist_vec, pred_vec.tolist())
+        hop_vec = _first_hops_vec(pred_vec, src).tolist()
+        res.source = names[src]
+        res.hops = {u: (names[h] if h >= 0 else None) for u, h in zip(names, hop_vec)}
+        return res
 
     @staticmethod
     def build_forwarding_table(result: DijkstraResult, source: str) -> List[Dict[str, Any]]:
         table = []
-        for dst, cost in sorted(result.dist.items(), key=lambda kv: (math.isinf(kv[1]), kv[0])):
-            if dst == source:
-                nh = source
-            else:
-                nh = result.next_hop(source, dst)
+        hops = result.first_hops(source)
+        # alcanzables primero, luego inalcanzables; cada grupo por nombre
+        reachable = sorted(d for d, c in result.dist.items() if not _isinf(c))
+        unreachable = sorted(d for d, c in result.dist.items() if _isinf(c))
+        for dst in reachable + unreachable:
+            cost = result.dist[dst]
             entry = {
                 "dest": dst,
-                "next_hop": nh,
-                "cost": cost if not math.isinf(cost) else float("inf")
+                "next_hop": hops[dst],
+                "cost": cost if not _isinf(cost) else _INF
             }
             table.append(entry)
         return table
 
+    @staticmethod
+    def build_forwarding_map(result: DijkstraResult, source: str) -> Dict[str, Optional[str]]:
+        return {dst: hop for dst, hop in result.first_hops(source).items() if dst != source}
+
+
+def format_costs(costs: Iterable[float], decimals: int = 3) -> List[str]:
+    """Columna de costos para imprimir; cada valor distinto se formatea una sola vez."""
+    costs = list(costs)
+    formatted: Dict[float, str] = {}
+    for cost in set(costs):
+        # los costos siempre son float (ver build_forwarding_table)
+        formatted[cost] = "Infinity" if _isinf(cost) else (str(int(cost)) if cost.is_integer() else f"{cost:.{decimals}f}")
+    return [formatted[c] for c in costs]
+
 
 def envelope_info(source: str, table: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
@@ -150,12 +372,8 @@ def main() -> None:
     else:
         # Tabla legible
         rows = [("Destino", "NextHop", "Costo")]
-        for e in table:
-            cost = e["cost"]
-            if cost == float("inf") or (isinstance(cost, float) and math.isinf(cost)):
-                cost_str = "Infinity"
-            else:
-                cost_str = str(int(cost)) if float(cost).is_integer() else f"{cost:.3f}"
+        cost_strs = format_costs(e["cost"] for e in table)
+        for e, cost_str in zip(table, cost_strs):
             rows.append((e["dest"], str(e["next_hop"]) if e["next_hop"] is not None else "null", cost_str))
         w0 = max(len(r[0]) for r in rows)
         w1 = max(len(r[1]) for r in rows)
@@ -1,13 +1,58 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import functools
 import json
-import socket
+import math
+import os
+import struct
 import threading
-import time
 import sys
-from typing import Dict, Any, Optional
-from dijkstra import Graph, DijkstraRouter, envelope_info
+from typing import Dict, Any, Optional, Tuple
+from dijkstra import Graph, DijkstraRouter, envelope_info, format_costs
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps
+
+    def _loads(data: bytes) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Los pares sin orjson mandan los costos inalcanzables como Infinity, que orjson rechaza
+            return json.loads(data)
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+
+def _dumps_info(message: Dict[str, Any]) -> bytes:
+    # orjson escribiría inf como null: con costos inalcanzables se usa json para mandar Infinity
+    # igual que los pares sin orjson
+    table = message["payload"]["routing_table"]
+    if orjson is not None and any(math.isinf(e["cost"]) for e in table):
+        return json.dumps(message).encode('utf-8')
+    return _dumps(message)
+
+
+@functools.lru_cache(maxsize=16)
+def _load_graph(path: str, mtime: float) -> Graph:
+    with open(path, 'r') as f:
+        graph = Graph.from_topology(json.load(f))
+    graph.to_csr()
+    return graph
+
+
+def load_graph(topo_file: str) -> Graph:
+    """Graph compartido por todos los nodos del proceso; se relee si cambia el archivo."""
+    path = os.path.abspath(topo_file)
+    return _load_graph(path, os.path.getmtime(path))
 
 class DijkstraNode:
     def __init__(self, node_id: str, port: int, topo_file: str, names_file: str = None):
@@ -15,12 +60,25 @@ class DijkstraNode:
         self.port = port
         self.neighbors = {}  
         self.routing_table = []
+        self.fwd_map: Dict[str, Optional[str]] = {}  # dest -> next_hop
+        self._display_rows: Tuple[Tuple[str, str, str], ...] = ()
         
-        # Cargar topología
-        with open(topo_file, 'r') as f:
-            topo_data = json.load(f)
+        # Mensajes salientes ya serializados
+        self._info_bytes: Optional[bytes] = None
+        self._hello_bytes = _dumps({
+            "proto": "dijkstra",
+            "type": "hello",
+            "from": self.node_id,
+            "ttl": 1,
+            "headers": [],
+            "payload": {
+                "port": self.port,
+                "message": "Hello from " + self.node_id
+            }
+        })
         
-        self.graph = Graph.from_topology(topo_data)
+        # Cargar topología (no modificar: puede estar compartida con otros nodos)
+        self.graph = load_graph(topo_file)
         self.router = DijkstraRouter(self.graph)
         
         self.node_addresses = {}
@@ -30,10 +88,20 @@ class DijkstraNode:
                 if names_data.get("type") == "names":
                     self.node_addresses = names_data["config"]
         
-        self.server_socket = None
+        self.server = None
         self.running = False
         
-        self.server_thread = None
+        # Conexiones TCP persistentes hacia vecinos: (host, port) -> (reader, writer)
+        self._conn_pool: Dict[Tuple[str, int], Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+        self._peer_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+        # Conexiones entrantes abiertas: tarea que la atiende -> writer
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        
+        # Toda la E/S corre en un único event loop en segundo plano;
+        # los métodos públicos siguen siendo síncronos para la CLI
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
         
     def start(self):
         print(f"Iniciando nodo {self.node_id} en puerto {self.port}")
@@ -55,52 +123,43 @@ class DijkstraNode:
         
     def start_server(self):
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(('localhost', self.port))
-            self.server_socket.listen(5)
-            
+            self.server = self._run(self._start_server())
             self.running = True
-            self.server_thread = threading.Thread(target=self.server_loop, daemon=True)
-            self.server_thread.start()
-            
             print(f"Servidor iniciado en localhost:{self.port}")
             
         except Exception as e:
             print(f"Error iniciando servidor: {e}")
             sys.exit(1)
     
-    def server_loop(self):
-        while self.running:
-            try:
-                client_socket, addr = self.server_socket.accept()
-                # Manejar cada conexión en un thread separado
-                handler_thread = threading.Thread(
-                    target=self.handle_client, 
-                    args=(client_socket, addr), 
-                    daemon=True
-                )
-                handler_thread.start()
-                
-            except Exception as e:
-                if self.running:
-                    print(f"Error en server loop: {e}")
+    async def _start_server(self):
+        # Sin SO_REUSEPORT: un segundo nodo en el mismo puerto debe fallar al hacer bind
+        return await asyncio.start_server(self._handle, 'localhost', self.port, backlog=128)
+    
+    def _run(self, coro):
+        # Ejecuta una corrutina en el loop del nodo. Desde el propio loop solo la agenda;
+        # desde otro hilo (CLI) espera el resultado y propaga errores.
+        if threading.current_thread() is self._loop_thread:
+            return self._loop.create_task(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
     
-    def handle_client(self, client_socket: socket.socket, addr):
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Cada mensaje llega como [4 bytes de largo][JSON]
+        task = asyncio.current_task()
+        self._handlers[task] = writer
         try:
-            data = client_socket.recv(4096).decode('utf-8')
-            if data:
-                message = json.loads(data)
-                self.process_message(message)
-                
-                # Enviar confirmación
-                response = {"status": "received", "from": self.node_id}
-                client_socket.send(json.dumps(response).encode('utf-8'))
-                
-        except Exception as e:
-            print(f"Error manejando cliente {addr}: {e}")
+            while True:
+                header = await reader.readexactly(4)
+                (length,) = struct.unpack('>I', header)
+                data = await reader.readexactly(length)
+                try:
+                    self.process_message(_loads(data))
+                except Exception as e:
+                    print(f"Error procesando mensaje: {e}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
         finally:
-            client_socket.close()
+            self._handlers.pop(task, None)
+            writer.close()
     
     def process_message(self, message: Dict[str, Any]):
         msg_type = message.get("type")
@@ -143,77 +202,129 @@ class DijkstraNode:
             self.forward_message(message)
     
     def discover_neighbors(self):
-        # Simular descubrimiento enviando HELLO a puertos consecutivos
-        base_port = 8000
-        for i in range(5):  # Probar puertos 8000-8004
-            target_port = base_port + i
-            if target_port != self.port:  # No enviarse a sí mismo
-                self.send_hello(target_port)
-                time.sleep(0.1)  # Pequeña pausa entre intentos
+        # HELLO solo a los vecinos que declara la topología y cuya dirección conocemos
+        targets = []
+        for n in self.graph.neighbors(self.node_id):
+            addr = self._parse_address(self.node_addresses.get(n))
+            if addr is not None:
+                targets.append(addr)
+        
+        if not targets:
+            # Sin archivo de nombres: probar puertos consecutivos 8000-8004
+            targets = [('localhost', p) for p in range(8000, 8005) if p != self.port]
+        
+        self._run(self._send_hellos(targets))
+    
+    async def _send_hellos(self, targets):
+        await asyncio.gather(*(self._send(h, p, self._hello_bytes) for h, p in targets), return_exceptions=True)
+    
+    @staticmethod
+    def _parse_address(value: Any) -> Optional[Tuple[str, int]]:
+        # Acepta 8001, "localhost:8001" o ["localhost", 8001]
+        if isinstance(value, int):
+            return ('localhost', value)
+        if isinstance(value, str) and value.rpartition(":")[2].isdigit():
+            host, _, port = value.rpartition(":")
+            return (host or 'localhost', int(port))
+        if isinstance(value, (list, tuple)) and len(value) == 2:
+            return (str(value[0]), int(value[1]))
+        return None
     
     def send_hello(self, target_port: int):
+        self.send_hello_to('localhost', target_port)
+    
+    def send_hello_to(self, host: str, port: int):
         try:
-            hello_message = {
-                "proto": "dijkstra",
-                "type": "hello",
-                "from": self.node_id,
-                "ttl": 1,
-                "headers": [],
-                "payload": {
-                    "port": self.port,
-                    "message": "Hello from " + self.node_id
-                }
-            }
-            
-            self.send_message_to_port('localhost', target_port, hello_message)
+            self.send_raw(host, port, self._hello_bytes)
             
         except Exception as e:
             pass
     
     def exchange_routing_info(self):
+        self._run(self._exchange_routing_info())
+    
+    async def _exchange_routing_info(self):
         if not self.neighbors:
             return
             
-        info_message = envelope_info(self.node_id, self.routing_table)
+        # Se serializa una sola vez por tabla, no una vez por vecino
+        if self._info_bytes is None:
+            self._info_bytes = _dumps_info(envelope_info(self.node_id, self.routing_table))
         
-        for neighbor_id, (host, port) in self.neighbors.items():
-            try:
-                self.send_message_to_port(host, port, info_message)
+        neighbors = list(self.neighbors.items())
+        results = await asyncio.gather(
+            *(self._send(host, port, self._info_bytes) for _, (host, port) in neighbors),
+            return_exceptions=True,
+        )
+        for (neighbor_id, _), res in zip(neighbors, results):
+            if isinstance(res, Exception):
+                print(f"Error enviando a {neighbor_id}: {res}")
+            else:
                 print(f"Tabla enviada a {neighbor_id}")
-            except Exception as e:
-                print(f"Error enviando a {neighbor_id}: {e}")
     
     def send_message_to_port(self, host: str, port: int, message: Dict[str, Any]):
-        try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.settimeout(2)  
-            client_socket.connect((host, port))
-            
-            message_json = json.dumps(message)
-            client_socket.send(message_json.encode('utf-8'))
-            
-            # Recibir confirmación
-            response = client_socket.recv(1024).decode('utf-8')
-            
-            client_socket.close()
-            
-        except Exception as e:
-            raise Exception(f"Error enviando mensaje a {host}:{port}: {e}")
+        self.send_raw(host, port, _dumps(message))
+    
+    def send_raw(self, host: str, port: int, buf: bytes):
+        self._run(self._send(host, port, buf))
+    
+    async def _send(self, host: str, port: int, buf: bytes):
+        # Cabecera y cuerpo van juntos al transporte sin concatenarlos: el mismo
+        # `buf` (p.ej. el INFO serializado) se comparte entre todos los vecinos y,
+        # donde asyncio lo soporta, writelines() los envía con un solo sendmsg
+        frame = (struct.pack('>I', len(buf)), buf)
+        key = (host, port)
+        
+        # Un lock por vecino: los frames hacia un mismo vecino no se intercalan
+        peer_lock = self._peer_locks.setdefault(key, asyncio.Lock())
+        async with peer_lock:
+            try:
+                try:
+                    writer = await self._get_or_connect(key)
+                    writer.writelines(frame)
+                    await writer.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    # El vecino cerró la conexión persistente: reconectar una vez
+                    self._evict(key)
+                    writer = await self._get_or_connect(key)
+                    writer.writelines(frame)
+                    await writer.drain()
+            except Exception as e:
+                self._evict(key)
+                raise Exception(f"Error enviando mensaje a {host}:{port}: {e}")
+    
+    async def _get_or_connect(self, key: Tuple[str, int]) -> asyncio.StreamWriter:
+        conn = self._conn_pool.get(key)
+        if conn is not None and (conn[0].at_eof() or conn[1].is_closing()):
+            # Nunca recibimos datos por esta conexión: EOF significa que el vecino la cerró
+            self._evict(key)
+            conn = None
+        if conn is None:
+            # asyncio ya desactiva Nagle (TCP_NODELAY) en sus transportes TCP
+            conn = await asyncio.wait_for(asyncio.open_connection(*key), timeout=2)
+            self._conn_pool[key] = conn
+        return conn[1]
+    
+    def _evict(self, key: Tuple[str, int]):
+        conn = self._conn_pool.pop(key, None)
+        if conn is not None:
+            conn[1].close()
     
     def forward_message(self, message: Dict[str, Any]):
+        self._run(self._forward_message(message))
+    
+    def resolve_next_hop(self, dest: str) -> Optional[str]:
+        return self.fwd_map.get(dest)
+    
+    async def _forward_message(self, message: Dict[str, Any]):
         dest = message.get("to")
         
-        # Buscar next hop en la tabla de ruteo
-        next_hop = None
-        for entry in self.routing_table:
-            if entry["dest"] == dest:
-                next_hop = entry["next_hop"]
-                break
+        next_hop = self.resolve_next_hop(dest)
         
         if next_hop and next_hop in self.neighbors:
             host, port = self.neighbors[next_hop]
             try:
-                self.send_message_to_port(host, port, message)
+                await self._send(host, port, _dumps(message))
                 print(f"Mensaje forwarded a {dest} via {next_hop}")
             except Exception as e:
                 print(f"Error forwarding: {e}")
@@ -224,10 +335,20 @@ class DijkstraNode:
         try:
             result = self.router.run(self.node_id)
             self.routing_table = self.router.build_forwarding_table(result, self.node_id)
+            self.fwd_map = self.router.build_forwarding_map(result, self.node_id)
+            cost_strs = format_costs((e["cost"] for e in self.routing_table), decimals=2)
+            self._display_rows = tuple(
+                (e["dest"], e["next_hop"] if e["next_hop"] else "null", cost_str)
+                for e, cost_str in zip(self.routing_table, cost_strs)
+            )
+            self._info_bytes = None
             print(f"Tabla de ruteo calculada: {len(self.routing_table)} entradas")
         except Exception as e:
             print(f"Error calculando tabla: {e}")
             self.routing_table = []
+            self.fwd_map = {}
+            self._display_rows = ()
+            self._info_bytes = None
     
     def print_routing_table(self):
         print(f"\nTabla de ruteo para {self.node_id}:")
@@ -235,16 +356,7 @@ class DijkstraNode:
         print(f"{'Destino':<10} {'NextHop':<10} {'Costo':<10}")
         print("-" * 40)
         
-        for entry in self.routing_table:
-            dest = entry["dest"]
-            next_hop = entry["next_hop"] if entry["next_hop"] else "null"
-            cost = entry["cost"]
-            
-            if cost == float("inf"):
-                cost_str = "Infinity"
-            else:
-                cost_str = str(int(cost)) if float(cost).is_integer() else f"{cost:.2f}"
-            
+        for dest, next_hop, cost_str in self._display_rows:
             print(f"{dest:<10} {next_hop:<10} {cost_str:<10}")
         
         print("-" * 40)
@@ -267,8 +379,22 @@ class DijkstraNode:
         print(f"Deteniendo nodo {self.node_id}")
         self.running = False
         
-        if self.server_socket:
-            self.server_socket.close()
+        try:
+            self._run(self._shutdown())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=2)
+    
+    async def _shutdown(self):
+        for key in list(self._conn_pool):
+            self._evict(key)
+        if self.server is not None:
+            self.server.close()
+        # Cerrar el transporte hace que cada _handle termine por EOF
+        handlers = list(self._handlers.items())
+        for _, writer in handlers:
+            writer.close()
+        await asyncio.gather(*(task for task, _ in handlers), return_exceptions=True)
 
 def main():
     parser = argparse.ArgumentParser(description="Nodo Dijkstra con comunicación por Sockets")
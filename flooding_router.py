@@ -1,13 +1,87 @@
 from __future__ import annotations
 import argparse
+import ctypes
+import ctypes.util
+import errno
+import hashlib
 import json
+import queue
 import socket
+import struct
+import sys
 import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, Any, Tuple, Optional, Set
+from typing import Dict, Iterable, Any, List, Tuple, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+
+    def _dumps_sorted(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _loads = json.loads
+
+    def _dumps_sorted(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 BUFFER_SIZE = 65535
+SENDMMSG_BATCH = 100
+RECVMMSG_BATCH = 64
+MSG_WAITFORONE = 0x10000
+SEEN_MAX = 1 << 17
+# Datagramas pendientes para los workers; con la cola llena se descartan (UDP ya es best-effort)
+QUEUE_MAX = 4096
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_Iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+# sendmmsg(2)/recvmmsg(2) solo existen en Linux; en otros sistemas se cae a sendto/recvfrom
+_libc_sendmmsg = None
+_libc_recvmmsg = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc_sendmmsg = _libc.sendmmsg
+        _libc_sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        _libc_sendmmsg.restype = ctypes.c_int
+        _libc_recvmmsg = _libc.recvmmsg
+        _libc_recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        _libc_recvmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _libc_sendmmsg = None
+        _libc_recvmmsg = None
+
+def _pack_sockaddr(host: str, port: int) -> bytes:
+    # struct sockaddr_in: familia (orden nativo), puerto y dirección (orden de red), 8 bytes de relleno
+    return struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(socket.gethostbyname(host)) + bytes(8)
+
+def _intern_id(v: Any) -> str:
+    # IDs de nodo internados: las búsquedas en dicts comparan por identidad antes que por contenido
+    return sys.intern(str(v))
 
 @dataclass
 class Graph:
@@ -27,15 +101,29 @@ class Graph:
             raise ValueError('Topología inválida')
         g = cls(directed=directed)
         cfg = topo["config"]
+        adj = g.adj
+        # Construcción en bloque: una fila por nodo y luego el espejo, sin add_edge por arista
         for u, neigh in cfg.items():
+            u = _intern_id(u)
             if isinstance(neigh, list):
-                for v in neigh:
-                    g.add_edge(u, str(v), 1.0)
+                row = dict.fromkeys(map(_intern_id, neigh), 1.0)
             elif isinstance(neigh, dict):
-                for v, w in neigh.items():
-                    g.add_edge(u, str(v), float(w))
+                row = {_intern_id(v): float(w) for v, w in neigh.items()}
             else:
                 raise ValueError(f"Vecinos inválidos para {u}")
+            if not row:
+                continue
+            cur = adj.get(u)
+            if cur is None:
+                adj[u] = row
+            else:
+                cur.update(row)
+            for v, w in row.items():
+                nb = adj.get(v)
+                if nb is None:
+                    nb = adj[v] = {}
+                if not directed:
+                    nb[u] = w
         return g
 
     def nodes(self) -> Iterable[str]:
@@ -44,7 +132,21 @@ class Graph:
     def neighbors(self, u: str) -> Iterable[str]:
         return self.adj.get(u, {}).keys()
 
+def _patch_ttl(raw: bytes, old_ttl: Any, new_ttl: int) -> Optional[bytes]:
+    # Reescribe solo el entero de "ttl" en los bytes recibidos; None si no es seguro hacerlo
+    i = raw.find(b'"ttl":')
+    if i < 0 or raw.find(b'"ttl":', i + 6) >= 0:
+        return None
+    j = i + 6
+    k = j
+    while k < len(raw) and 48 <= raw[k] <= 57:
+        k += 1
+    if k == j or raw[j:k] != str(old_ttl).encode("ascii"):
+        return None
+    return raw[:j] + str(new_ttl).encode("ascii") + raw[k:]
+
 def envelope_message(proto: str, typ: str, src: str, dst: str, ttl: int, payload: Any, headers: Optional[list] = None) -> Dict[str, Any]:
+    # Un único dict literal: orjson lo serializa directo, sin objeto intermedio
     return {
         "proto": proto,
         "type": typ,
@@ -56,13 +158,33 @@ def envelope_message(proto: str, typ: str, src: str, dst: str, ttl: int, payload
     }
 
 class FloodingNode:
-    def __init__(self, node_id: str, graph: Graph, endpoints: Dict[str, Tuple[str, int]], listen: bool = True):
-        self.node_id = node_id
+    def __init__(self, node_id: str, graph: Graph, endpoints: Dict[str, Tuple[str, int]], listen: bool = True, workers: int = 2):
+        self.node_id = _intern_id(node_id)
+        # Tabla de IDs conocidos: "from"/"to" recibidos se canonizan al objeto internado
+        self._id_table: Dict[str, str] = {n: n for n in (*graph.nodes(), *endpoints, self.node_id)}
         self.graph = graph
         self.endpoints = endpoints
-        self.seen: Set[str] = set()
+        # Endpoints resueltos una sola vez: IP literal para sendto y sockaddr empaquetado para sendmmsg
+        self._addr_cache: Dict[str, Tuple[str, int]] = {}
+        self._sockaddr_cache: Dict[Tuple[str, int], bytes] = {}
+        for name, (host, port) in endpoints.items():
+            try:
+                addr = (socket.gethostbyname(host), int(port))
+                self._sockaddr_cache[addr] = _pack_sockaddr(*addr)
+            except (OSError, UnicodeError):
+                continue  # se resolverá en cada envío como antes
+            self._addr_cache[name] = addr
+        # LRU acotado de hashes de 64 bits: memoria constante y desalojo O(1)
+        self.seen: OrderedDict[int, None] = OrderedDict()
+        self._seen_lock = threading.Lock()
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.listen = listen
+        # Con workers > 0, _serve solo recibe y encola; los workers deduplican y reenvían
+        # cada uno con su propio socket de envío
+        self.workers = max(0, int(workers))
+        self._queue: "queue.Queue[bytes]" = queue.Queue(maxsize=QUEUE_MAX)
+        self._tls = threading.local()
+        self._dispatch = self._enqueue if self.workers else self._handle_raw
         if self.listen:
             host, port = self.endpoints[self.node_id]
             # Bind solo cuando este proceso actuará como listener del nodo
@@ -71,32 +193,98 @@ class FloodingNode:
     def start(self) -> None:
         if not self.listen:
             return
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
         t = threading.Thread(target=self._serve, daemon=True)
         t.start()
 
-    def _serve(self) -> None:
+    def _work(self) -> None:
+        self._tls.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        get = self._queue.get
         while True:
-            data, _ = self.sock.recvfrom(BUFFER_SIZE)
+            data = get()
             try:
-                msg = json.loads(data.decode("utf-8"))
+                self._handle_raw(data)
             except Exception:
+                # un datagrama inválido no debe tumbar al worker
                 continue
-            self._handle(msg)
-
-    def _msg_key(self, msg: Dict[str, Any]) -> str:
-        # Clave simple para evitar duplicados básicos
-        return json.dumps(
-            {"from": msg.get("from"), "to": msg.get("to"), "payload": msg.get("payload")},
-            sort_keys=True, ensure_ascii=False
-        )
-
-    def _handle(self, msg: Dict[str, Any]) -> None:
-        key = self._msg_key(msg)
-        if key in self.seen:
+
+    def _enqueue(self, data: bytes) -> None:
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            pass
+
+    def _sender(self) -> socket.socket:
+        # Socket de envío del worker actual; fuera de los workers se usa el socket del nodo
+        return getattr(self._tls, "sock", None) or self.sock
+
+    def _serve(self) -> None:
+        if _libc_recvmmsg is not None:
+            self._serve_mmsg()
+            return
+        while True:
+            data, _ = self.sock.recvfrom(BUFFER_SIZE)
+            self._dispatch(data)
+
+    def _serve_mmsg(self) -> None:
+        # Buffers e iovecs reservados una vez y reutilizados en cada llamada
+        bufs = [ctypes.create_string_buffer(BUFFER_SIZE) for _ in range(RECVMMSG_BATCH)]
+        iovs = (_Iovec * RECVMMSG_BATCH)()
+        hdrs = (_Mmsghdr * RECVMMSG_BATCH)()
+        for i, b in enumerate(bufs):
+            iovs[i].iov_base = ctypes.addressof(b)
+            iovs[i].iov_len = BUFFER_SIZE
+            hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+            hdrs[i].msg_hdr.msg_iovlen = 1
+        fd = self.sock.fileno()
+        addr = ctypes.addressof(hdrs)
+        while True:
+            # MSG_WAITFORONE: bloquea hasta el primer datagrama y luego drena los ya encolados
+            n = _libc_recvmmsg(fd, addr, RECVMMSG_BATCH, MSG_WAITFORONE, None)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                raise OSError(err, "recvmmsg falló")
+            for i in range(n):
+                self._dispatch(ctypes.string_at(bufs[i], hdrs[i].msg_len))
+
+    def _handle_raw(self, data: bytes) -> None:
+        try:
+            msg = _loads(data)
+        except Exception:
             return
-        self.seen.add(key)
+        if not isinstance(msg, dict):
+            return
+        self._handle(msg, raw=data)
+
+    def _msg_key(self, msg: Dict[str, Any]) -> bytes:
+        # from|to|payload; el payload de texto se usa tal cual, sin re-serializar a JSON
+        payload = msg.get("payload")
+        if isinstance(payload, str):
+            raw = payload.encode("utf-8")
+        else:
+            raw = _dumps_sorted(payload)
+        return f"{msg.get('from')}|{msg.get('to')}|".encode("utf-8") + raw
 
-        if msg.get("to") == self.node_id or msg.get("type") == "echo":
+    def _intern_node(self, s: Any) -> Any:
+        # Solo IDs conocidos: con setdefault la tabla crecería con cualquier valor recibido
+        return self._id_table.get(s, s) if isinstance(s, str) else s
+
+    def _handle(self, msg: Dict[str, Any], raw: Optional[bytes] = None) -> None:
+        key = int.from_bytes(hashlib.blake2b(self._msg_key(msg), digest_size=8).digest(), "little")
+        with self._seen_lock:
+            if key in self.seen:
+                self.seen.move_to_end(key)
+                return
+            self.seen[key] = None
+            if len(self.seen) > SEEN_MAX:
+                self.seen.popitem(last=False)
+
+        src = self._intern_node(msg.get("from"))
+        dst = self._intern_node(msg.get("to"))
+        if dst == self.node_id or msg.get("type") == "echo":
             print(json.dumps({"node": self.node_id, "event": "recv", "msg": msg}, ensure_ascii=False))
             if msg.get("type") == "echo":
                 return
@@ -105,22 +293,65 @@ class FloodingNode:
         if ttl <= 0:
             return
 
-        fwd = dict(msg)
-        fwd["ttl"] = ttl
+        # Se parchea el TTL en los bytes recibidos; si no se puede, se re-serializa una vez
+        fwd = _patch_ttl(raw, msg.get("ttl"), ttl) if raw is not None else None
+        if fwd is None:
+            fwd = _dumps({**msg, "ttl": ttl})
         # Nota: usamos 'from' como referencia para no devolver al origen inmediato
-        self._flood(fwd, came_from=msg.get("from"))
+        self._flood(fwd, came_from=src)
 
-    def _flood(self, msg: Dict[str, Any], came_from: Optional[str] = None) -> None:
+    def _sendto_each(self, packets: List[Tuple[bytes, Tuple[str, int]]]) -> None:
+        sock = self._sender()
+        for buf, addr in packets:
+            try:
+                sock.sendto(buf, addr)
+            except Exception:
+                pass
+
+    def _sendmmsg(self, packets: List[Tuple[bytes, Tuple[str, int]]]) -> None:
+        if _libc_sendmmsg is None:
+            self._sendto_each(packets)
+            return
+        fd = self._sender().fileno()
+        for start in range(0, len(packets), SENDMMSG_BATCH):
+            batch = packets[start:start + SENDMMSG_BATCH]
+            try:
+                names = [ctypes.create_string_buffer(self._sockaddr_cache.get(addr) or _pack_sockaddr(*addr), 16) for _, addr in batch]
+            except (OSError, UnicodeError):
+                self._sendto_each(batch)
+                continue
+            # Un iovec por cuerpo distinto: en _flood todos los paquetes comparten el mismo buffer
+            iovs: Dict[int, _Iovec] = {}
+            for buf, _ in batch:
+                if id(buf) not in iovs:
+                    iovs[id(buf)] = _Iovec(ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p), len(buf))
+            hdrs = (_Mmsghdr * len(batch))()
+            for i, (buf, _) in enumerate(batch):
+                h = hdrs[i].msg_hdr
+                h.msg_name = ctypes.cast(names[i], ctypes.c_void_p)
+                h.msg_namelen = 16
+                h.msg_iov = ctypes.pointer(iovs[id(buf)])
+                h.msg_iovlen = 1
+            sent = 0
+            while sent < len(batch):
+                r = _libc_sendmmsg(fd, ctypes.addressof(hdrs) + sent * ctypes.sizeof(_Mmsghdr), len(batch) - sent, 0)
+                if r <= 0:
+                    # El paquete en cabeza falló: se reintenta solo con sendto y se sigue con el resto
+                    self._sendto_each([batch[sent]])
+                    r = 1
+                sent += r
+
+    def _flood(self, msg: Union[Dict[str, Any], bytes], came_from: Optional[str] = None) -> None:
+        buf = msg if isinstance(msg, bytes) else _dumps(msg)
+        packets = []
         for neigh in self.graph.neighbors(self.node_id):
             if neigh == came_from:
                 continue
-            if neigh not in self.endpoints:
+            addr = self._addr_cache.get(neigh) or self.endpoints.get(neigh)
+            if addr is None:
                 continue
-            host, port = self.endpoints[neigh]
-            try:
-                self.sock.sendto(json.dumps(msg).encode("utf-8"), (host, port))
-            except Exception:
-                pass
+            packets.append((buf, addr))
+        self._sendmmsg(packets)
 
     def send(self, to: str, payload: Any, ttl: int = 8) -> None:
         ttl = max(1, int(ttl))
@@ -129,13 +360,11 @@ class FloodingNode:
 
     def ping(self, ttl: int = 4) -> None:
         ttl = max(1, int(ttl))
+        packets = []
         for neigh in self.graph.neighbors(self.node_id):
             msg = envelope_message("flooding", "echo", self.node_id, neigh, ttl, {"ts": time.time(), "via": self.node_id})
-            host, port = self.endpoints.get(neigh, ("127.0.0.1", 0))
-            try:
-                self.sock.sendto(json.dumps(msg).encode("utf-8"), (host, port))
-            except Exception:
-                pass
+            packets.append((_dumps(msg), self._addr_cache.get(neigh) or self.endpoints.get(neigh, ("127.0.0.1", 0))))
+        self._sendmmsg(packets)
 
 def load_endpoints(path: str) -> Dict[str, Tuple[str, int]]:
     with open(path, "r", encoding="utf-8") as f:
@@ -143,9 +372,9 @@ def load_endpoints(path: str) -> Dict[str, Tuple[str, int]]:
     eps: Dict[str, Tuple[str, int]] = {}
     for k, v in raw.items():
         if isinstance(v, list) and len(v) == 2:
-            eps[k] = (str(v[0]), int(v[1]))
+            eps[_intern_id(k)] = (str(v[0]), int(v[1]))
         elif isinstance(v, dict) and "host" in v and "port" in v:
-            eps[k] = (str(v["host"]), int(v["port"]))
+            eps[_intern_id(k)] = (str(v["host"]), int(v["port"]))
         else:
             raise ValueError("endpoint inválido")
     return eps
@@ -160,6 +389,7 @@ def main() -> None:
     ap.add_argument("--msg", help="Payload del mensaje")
     ap.add_argument("--ttl", type=int, default=8, help="TTL inicial")
     ap.add_argument("--ping", action="store_true", help="Enviar echos a vecinos")
+    ap.add_argument("--workers", type=int, default=2, help="Hilos que procesan y reenvían (0 = en el hilo receptor)")
     args = ap.parse_args()
 
     with open(args.topo, "r", encoding="utf-8") as f:
@@ -172,7 +402,7 @@ def main() -> None:
 
     # Si solo vamos a enviar o a pingear, NO escuchamos (evitamos bind y el WinError 10048)
     listen = not (args.send or args.ping)
-    node = FloodingNode(args.node, g, eps, listen=listen)
+    node = FloodingNode(args.node, g, eps, listen=listen, workers=args.workers)
 
     if listen:
         node.start()
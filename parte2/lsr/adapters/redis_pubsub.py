@@ -1,10 +1,11 @@
 # lsr/adapters/redis_pubsub.py
 from __future__ import annotations
-import asyncio, json, threading
+import threading
 from typing import Callable, Dict, Optional
+from ..messages import dumps, loads
 
 try:
-    import redis.asyncio as redis
+    import redis
 except ImportError:
     redis = None
 
@@ -13,9 +14,14 @@ class RedisPubSubAdapter:
     Adaptador de transporte vía Redis Pub/Sub.
     Interfaz:
       - send(peer_id, msg_dict)
+      - send_bytes(peer_id, bytes_json)
+      - send_many([(peer_id, msg_dict), ...])
       - stop()
     Llama a on_message(peer_id, msg_dict) cuando llega JSON por tu canal.
     """
+    # Serialización del transporte; permite codificar una vez y reenviar con send_bytes
+    encode = staticmethod(dumps)
+
     def __init__(
         self,
         node_id: str,
@@ -34,109 +40,99 @@ class RedisPubSubAdapter:
         self.redis_pass = redis_pass
         self.on_message = on_message
 
-        self._loop = asyncio.new_event_loop()
-        self._thread = threading.Thread(target=self._run_loop, daemon=True)
         self._stop_evt = threading.Event()
-
-        self._r: Optional[redis.Redis] = None
-        self._pubsub = None
         self._my_channel = f"{self.prefix}.{self.node_id}"
 
+        # Cliente síncrono: su pool de conexiones es thread-safe, así que send()
+        # publica directo desde el hilo que llama, sin loop asyncio intermedio
+        self._r = redis.Redis(
+            host=self.redis_host,
+            port=self.redis_port,
+            password=self.redis_pass,
+            decode_responses=False,
+        )
+        self._r.ping()
+        self._pubsub = self._r.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self._my_channel: self._on_raw})
+        print(f"[REDIS] {self.node_id} suscrito a canal: {self._my_channel}")
 
-        # arranca el loop
+        self._thread = threading.Thread(target=self._reader, daemon=True)
         self._thread.start()
-        # crea conexión y suscripción en el loop
-        fut = asyncio.run_coroutine_threadsafe(self._async_init(), self._loop)
-        fut.result()  # propaga errores si los hay
 
     # ---------- API pública ----------
     def send(self, peer_id: str, msg: Dict):
         """
         Publica el mensaje JSON en el canal del destino: <prefix>.<peer_id>
         """
+        self.send_bytes(peer_id, dumps(msg))
+
+    def send_bytes(self, peer_id: str, buf: bytes):
         channel = f"{self.prefix}.{peer_id}"
-        # Asegura que es JSON-serializable (línea por compatibilidad con otros grupos)
-        payload = json.dumps(msg, ensure_ascii=False)
-        fut = asyncio.run_coroutine_threadsafe(
-            self._r.publish(channel, payload),
-            self._loop,
-        )
-        # opcional: fut.result() para bloquear hasta publicar
+        try:
+            self._r.publish(channel, buf)
+        except Exception as e:
+            print(f"[REDIS] error publicando en {channel}: {e}")
+
+    def send_many(self, items: list[tuple[str, Dict]]):
+        """
+        Publica varios mensajes en un solo pipeline (1 RTT en vez de N)
+        """
+        if not items:
+            return
+        pipe = self._r.pipeline(transaction=False)
+        for peer_id, msg in items:
+            pipe.publish(f"{self.prefix}.{peer_id}", dumps(msg))
+        try:
+            pipe.execute()
+        except Exception as e:
+            print(f"[REDIS] error publicando lote de {len(items)} mensajes: {e}")
 
     def stop(self):
         self._stop_evt.set()
-        fut = asyncio.run_coroutine_threadsafe(self._async_close(), self._loop)
         try:
-            fut.result(timeout=2)
+            # al desuscribirse, listen() termina y el hilo lector sale solo
+            self._pubsub.unsubscribe(self._my_channel)
         except Exception:
             pass
-        self._loop.call_soon_threadsafe(self._loop.stop)
         self._thread.join(timeout=2)
-
-    # ---------- Internos ----------
-    def _run_loop(self):
-        # En Windows, asegura política de loop compatible
         try:
-            import platform, asyncio
-            if platform.system() == "Windows":
-                asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())  # type: ignore
+            self._pubsub.close()
         except Exception:
             pass
-        asyncio.set_event_loop(self._loop)
-        self._loop.run_forever()
-
-    async def _async_init(self):
-        self._r = redis.Redis(
-            host=self.redis_host,
-            port=self.redis_port,
-            password=self.redis_pass,
-            decode_responses=True,
-        )
-        await self._r.ping()
-        self._pubsub = self._r.pubsub()
-        await self._pubsub.subscribe(self._my_channel)
-
-        # ✅ aquí sí existe self
-        print(f"[REDIS] {self.node_id} suscrito a canal: {self._my_channel}")
-
-        asyncio.create_task(self._reader())
-
-
-    async def _async_close(self):
         try:
-            if self._pubsub is not None:
-                await self._pubsub.unsubscribe(self._my_channel)
-                await self._pubsub.close()
+            self._r.close()
         except Exception:
             pass
+
+    # ---------- Internos ----------
+    def _reader(self):
+        # listen() bloquea en el socket hasta que llega algo (sin sondeo ni sleeps);
+        # cada mensaje lo despacha redis-py al handler _on_raw registrado en subscribe().
+        # Termina solo cuando stop() se desuscribe del canal.
         try:
-            if self._r is not None:
-                await self._r.close()
+            for _ in self._pubsub.listen():
+                pass
         except Exception:
-            pass
-
-    async def _reader(self):
-        # lee mensajes de nuestro canal y despacha a on_message
-        while not self._stop_evt.is_set():
-            try:
-                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
-                if not msg:
-                    await asyncio.sleep(0.05)
-                    continue
-                data = msg.get("data")
-                if not data:
-                    continue
-                # data es un string JSON publicado por otros nodos
-                try:
-                    obj = json.loads(data)
-                except Exception:
-                    continue  # ignora basura o formatos distintos
-
-                # Determina el "peer_id" para on_message; en nuestro protocolo,
-                # el emisor viene en obj["from"] (que debe ser el ID del nodo).
-                peer_id = obj.get("from", "?")
-                # Llama al manejador superior (forwarding.on_message)
-                self.on_message(peer_id, obj)
-
-            except Exception:
-                await asyncio.sleep(0.1)
+            if not self._stop_evt.is_set():
+                raise
+
+    def _on_raw(self, msg: Dict):
+        data = msg.get("data")
+        if not data:
+            return
+        # data son los bytes JSON crudos (decode_responses=False): se parsean sin pasar por str
+        try:
+            obj = loads(data)
+        except Exception:
+            return  # ignora basura o formatos distintos
+        if not isinstance(obj, dict):
+            return
+
+        # Determina el "peer_id" para on_message; en nuestro protocolo,
+        # el emisor viene en obj["from"] (que debe ser el ID del nodo).
+        peer_id = obj.get("from", "?")
+        # Llama al manejador superior (forwarding.on_message)
+        try:
+            self.on_message(peer_id, obj)
+        except Exception as e:
+            print(f"[REDIS] error procesando mensaje: {e}")
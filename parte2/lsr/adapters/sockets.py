@@ -1,15 +1,25 @@
 from __future__ import annotations
-import socket, selectors, threading
+import collections, socket, selectors, threading
 from typing import Dict, Callable
 from ..messages import encode, decode
 
+SEND_BATCH = 64
+SNDBUF_BYTES = 1 << 20
+
 class SocketAdapter:
+    # Serialización del transporte (JSON + "\n"); permite codificar una vez y reenviar con send_bytes
+    encode = staticmethod(encode)
+
     def __init__(self, node_id: str, listen_host: str, listen_port: int, peer_endpoints: dict[str, tuple[str,int]], on_message: Callable[[str, dict], None]):
         self.node_id = node_id
         self.selector = selectors.DefaultSelector()
         self.on_message = on_message
         self.peers = peer_endpoints  # peer_id -> (host,port)
         self.out_socks: dict[str, socket.socket] = {}
+        self._out_queues: dict[str, collections.deque] = {}
+        self._out_lock = threading.Lock()
+        self._want_write: set[str] = set()
+        self._rxbuf: dict[socket.socket, bytearray] = {}
 
         self.lsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.lsock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -29,7 +39,10 @@ class SocketAdapter:
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.settimeout(1.0)
         try:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF_BYTES)
             s.connect((host,port))
+            # Sin Nagle: los mensajes ya salen agrupados desde la cola
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             s.setblocking(False)
             self.selector.register(s, selectors.EVENT_READ, data=peer_id)
             self.out_socks[peer_id] = s
@@ -37,19 +50,78 @@ class SocketAdapter:
             s.close()
 
     def send(self, peer_id: str, msg: dict):
+        self.send_bytes(peer_id, encode(msg))
+
+    def send_bytes(self, peer_id: str, buf: bytes):
         if peer_id not in self.out_socks and peer_id in self.peers:
             self._connect_peer(peer_id)
-        s = self.out_socks.get(peer_id)
-        if s:
+        if peer_id in self.out_socks:
+            with self._out_lock:
+                self._out_queues.setdefault(peer_id, collections.deque()).append(buf)
+            self._flush(peer_id)
+
+    def send_many(self, items: list[tuple[str, dict]]):
+        # Encola todo primero y luego un solo flush (un sendmsg vectorizado) por peer
+        for peer_id, _ in items:
+            if peer_id not in self.out_socks and peer_id in self.peers:
+                self._connect_peer(peer_id)
+        touched = []
+        with self._out_lock:
+            for peer_id, msg in items:
+                if peer_id not in self.out_socks:
+                    continue
+                q = self._out_queues.setdefault(peer_id, collections.deque())
+                if not q:
+                    touched.append(peer_id)
+                q.append(encode(msg))
+        for peer_id in touched:
+            self._flush(peer_id)
+
+    def _flush(self, peer_id: str):
+        # Vacía la cola del peer con escrituras vectorizadas (un sendmsg por lote)
+        with self._out_lock:
+            s = self.out_socks.get(peer_id)
+            q = self._out_queues.get(peer_id)
+            if s is None or not q:
+                return
             try:
-                s.sendall(encode(msg))
+                while q:
+                    batch = [q[i] for i in range(min(len(q), SEND_BATCH))]
+                    if hasattr(s, "sendmsg"):
+                        sent = s.sendmsg(batch)
+                    else:
+                        sent = s.send(b"".join(batch))
+                    # Descarta lo enviado; un envío parcial deja pendiente el resto del buffer en cabeza
+                    while sent and q:
+                        head = q[0]
+                        if sent >= len(head):
+                            sent -= len(head)
+                            q.popleft()
+                        else:
+                            q[0] = memoryview(head)[sent:]
+                            sent = 0
+            except BlockingIOError:
+                # Buffer del kernel lleno: el selector avisará cuando se pueda escribir
+                if peer_id not in self._want_write:
+                    self._want_write.add(peer_id)
+                    self.selector.modify(s, selectors.EVENT_READ | selectors.EVENT_WRITE, data=peer_id)
+                return
             except Exception:
-                try:
-                    self.selector.unregister(s)
-                except Exception:
-                    pass
-                self.out_socks.pop(peer_id, None)
-                s.close()
+                self._drop_peer(peer_id, s)
+                return
+            if peer_id in self._want_write:
+                self._want_write.discard(peer_id)
+                self.selector.modify(s, selectors.EVENT_READ, data=peer_id)
+
+    def _drop_peer(self, peer_id: str, s: socket.socket):
+        try:
+            self.selector.unregister(s)
+        except Exception:
+            pass
+        self.out_socks.pop(peer_id, None)
+        self._out_queues.pop(peer_id, None)
+        self._want_write.discard(peer_id)
+        s.close()
 
     def _loop(self):
         while not self._stop.is_set():
@@ -63,25 +135,43 @@ class SocketAdapter:
                 else:
                     peer_tag = key.data
                     sock = key.fileobj
+                    if mask & selectors.EVENT_WRITE:
+                        self._flush(peer_tag)
+                        if not mask & selectors.EVENT_READ:
+                            continue
                     try:
                         buf = sock.recv(65536)
                         if not buf:
                             self.selector.unregister(sock)
+                            self._rxbuf.pop(sock, None)
                             sock.close()
                             continue
-                        # dividir por líneas (mensajes terminan en \n)
-                        for line in buf.split(b"\n"):
+                        # Acumulador por conexión: un mensaje partido entre dos recv espera al resto
+                        rxbuf = self._rxbuf.setdefault(sock, bytearray())
+                        rxbuf += buf
+                        start = 0
+                        while True:
+                            i = rxbuf.find(b"\n", start)
+                            if i < 0:
+                                break
+                            line = bytes(rxbuf[start:i])
+                            start = i + 1
                             if not line.strip():
                                 continue
-                            msg = decode(line + b"\n")
+                            try:
+                                msg = decode(line)
+                            except Exception:
+                                continue  # línea corrupta: se descarta sin cerrar la conexión
                             # Para sockets entrantes, no conocemos el peer_id real, se asume en campo 'from'
                             peer_id = msg.get("from", "?")
                             self.on_message(peer_id, msg)
+                        del rxbuf[:start]
                     except Exception:
                         try:
                             self.selector.unregister(sock)
                         except Exception:
                             pass
+                        self._rxbuf.pop(sock, None)
                         sock.close()
 
     def stop(self):
@@ -7,6 +7,12 @@ import heapq
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional, Iterable, Any
 
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:
+    csr_matrix = None
+
 
 
 @dataclass
@@ -140,7 +146,7 @@ def envelope_info(source: str, table: List[Dict[str, Any]]) -> Dict[str, Any]:
         "from": source,
         "to": "*",
         "ttl": 16,
-        "headers": [],
+        "headers": {},
         "payload": {"routing_table": table},
     }
 
@@ -162,7 +168,42 @@ def print_table_human(table: List[Dict[str, Any]], source: str) -> None:
     for r in rows[1:]:
         print(f"{r[0]:<{w0}}  {r[1]:<{w1}}  {r[2]:>{w2}}")
 
+def _shortest_paths_scipy(graph, source: str):
+    # Mismo resultado que la versión en Python, pero el bucle de Dijkstra corre en C
+    indptr, indices, weights, node_index = graph.to_csr()
+    if weights and min(weights) < 0:
+        raise ValueError("Dijkstra requiere pesos no negativos")
+    names = list(node_index)
+    n = len(names)
+    src = node_index[source]
+    mat = csr_matrix((weights, indices, indptr), shape=(n, n))
+    dist_vec, pred_vec = csgraph_dijkstra(mat, directed=True, indices=src, return_predecessors=True)
+    pred = pred_vec.tolist()
+
+    dist: Dict[str, float] = dict(zip(names, dist_vec.tolist()))
+    prev: Dict[str, Optional[str]] = {u: (names[p] if p >= 0 else None) for u, p in zip(names, pred)}
+    # Primer salto por destino: se sube por los predecesores una sola vez, memorizando cada camino
+    hop = [-1] * n
+    hop[src] = src
+    for v in range(n):
+        if hop[v] >= 0 or pred[v] < 0:
+            continue
+        path = []
+        u = v
+        while hop[u] < 0 and pred[u] >= 0 and pred[u] != src:
+            path.append(u)
+            u = pred[u]
+        h = hop[u] if hop[u] >= 0 else (u if pred[u] == src else -1)
+        hop[u] = h
+        for w in path:
+            hop[w] = h
+    nh: Dict[str, str] = {names[v]: names[h] for v, h in enumerate(hop) if h >= 0}
+    return dist, prev, nh
+
+
 def shortest_paths(graph, source: str):
+    if csr_matrix is not None and hasattr(graph, "to_csr") and source in graph.adj:
+        return _shortest_paths_scipy(graph, source)
 
     # Inicialización
     dist: Dict[str, float] = {u: math.inf for u in graph.nodes()}
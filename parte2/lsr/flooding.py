@@ -1,16 +1,149 @@
 # flooding_node.py
 from __future__ import annotations
 import argparse
+import collections
+import ctypes
+import ctypes.util
+import errno
+import functools
+import hashlib
+import itertools
+import os
 import json
+import math
 import socket
+import struct
+import sys
 import threading
 import time
-import uuid
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, Any, Tuple, Optional, Set
+from typing import Dict, Iterable, Any, List, Tuple, Optional, Union
 
-BUFFER_SIZE = 65535
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import mmh3
+except ImportError:
+    mmh3 = None
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _loads(data):
+        # json.loads no acepta memoryview; str() decodifica directo desde la vista, sin copiar antes a bytes
+        return json.loads(str(data, "utf-8") if isinstance(data, memoryview) else data)
 
+BUFFER_SIZE = 65535
+SENDMMSG_BATCH = 100
+RECV_BATCH = 100
+RECVMMSG_BATCH = 32
+MSG_WAITFORONE = 0x10000
+# Sin MSG_DONTWAIT (Windows) no se drena: cada datagrama pasa por el recv bloqueante
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_Iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+# sendmmsg(2)/recvmmsg(2) solo existen en Linux; en otros sistemas se cae a sendto/recvfrom_into
+_libc_sendmmsg = None
+_libc_recvmmsg = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc_sendmmsg = _libc.sendmmsg
+        _libc_sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        _libc_sendmmsg.restype = ctypes.c_int
+        _libc_recvmmsg = _libc.recvmmsg
+        _libc_recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        _libc_recvmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _libc_sendmmsg = None
+        _libc_recvmmsg = None
+
+@functools.lru_cache(maxsize=1024)
+def _pack_sockaddr(host: str, port: int) -> bytes:
+    # struct sockaddr_in: familia (orden nativo), puerto y dirección (orden de red), 8 bytes de relleno
+    return struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(socket.gethostbyname(host)) + bytes(8)
+
+def _sockaddr_buf(addr: Tuple[str, int]) -> Optional[ctypes.Array]:
+    # sockaddr_in ya empaquetado para msg_name; None si no hay sendmmsg o no se puede resolver
+    if _libc_sendmmsg is None:
+        return None
+    try:
+        return ctypes.create_string_buffer(_pack_sockaddr(*addr), 16)
+    except (OSError, UnicodeError):
+        return None
+
+# (endpoint, cuerpo, sockaddr_in pre-empaquetado o None)
+_Packet = Tuple[Tuple[str, int], bytes, Optional[ctypes.Array]]
+
+def _sendto_each(sock: socket.socket, pkts: List[_Packet]) -> None:
+    for addr, buf, _ in pkts:
+        try:
+            sock.sendto(buf, addr)
+        except Exception:
+            # ignora fallos puntuales de envío
+            pass
+
+def _sendmmsg_batch(sock: socket.socket, pkts: List[_Packet]) -> None:
+    # Un solo syscall por lote de hasta SENDMMSG_BATCH datagramas
+    if _libc_sendmmsg is None:
+        _sendto_each(sock, pkts)
+        return
+    fd = sock.fileno()
+    for start in range(0, len(pkts), SENDMMSG_BATCH):
+        batch = pkts[start:start + SENDMMSG_BATCH]
+        # Los vecinos de _flood traen su sockaddr_in resuelto de antemano; solo se empaqueta el resto
+        names = [sa if sa is not None else _sockaddr_buf(addr) for addr, _, sa in batch]
+        if None in names:
+            _sendto_each(sock, batch)
+            continue
+        # Un iovec por cuerpo distinto: en _flood todos los paquetes comparten el mismo buffer
+        iovs: Dict[int, _Iovec] = {}
+        for _, buf, _ in batch:
+            if id(buf) not in iovs:
+                iovs[id(buf)] = _Iovec(ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p), len(buf))
+        hdrs = (_Mmsghdr * len(batch))()
+        for i, (_, buf, _) in enumerate(batch):
+            h = hdrs[i].msg_hdr
+            h.msg_name = ctypes.addressof(names[i])
+            h.msg_namelen = 16
+            h.msg_iov = ctypes.pointer(iovs[id(buf)])
+            h.msg_iovlen = 1
+        sent = 0
+        while sent < len(batch):
+            r = _libc_sendmmsg(fd, ctypes.addressof(hdrs) + sent * ctypes.sizeof(_Mmsghdr), len(batch) - sent, 0)
+            if r <= 0:
+                # El paquete en cabeza falló: se reintenta solo con sendto y se sigue con el resto
+                _sendto_each(sock, [batch[sent]])
+                r = 1
+            sent += r
+
+
+def _intern_id(v: Any) -> str:
+    # IDs de nodo internados: las búsquedas en dicts comparan por identidad antes que por contenido
+    return sys.intern(str(v))
 
 @dataclass
 class Graph:
@@ -30,15 +163,29 @@ class Graph:
             raise ValueError('Topología inválida: se esperaba {"type":"topo","config":{...}}')
         g = cls(directed=directed)
         cfg = topo["config"]
+        adj = g.adj
+        # Construcción en bloque: una fila por nodo y luego el espejo, sin add_edge por arista
         for u, neigh in cfg.items():
+            u = _intern_id(u)
             if isinstance(neigh, list):
-                for v in neigh:
-                    g.add_edge(str(u), str(v), 1.0)
+                row = dict.fromkeys(map(_intern_id, neigh), 1.0)
             elif isinstance(neigh, dict):
-                for v, w in neigh.items():
-                    g.add_edge(str(u), str(v), float(w))
+                row = {_intern_id(v): float(w) for v, w in neigh.items()}
             else:
                 raise ValueError(f"Vecinos inválidos para {u}")
+            if not row:
+                continue
+            cur = adj.get(u)
+            if cur is None:
+                adj[u] = row
+            else:
+                cur.update(row)
+            for v, w in row.items():
+                nb = adj.get(v)
+                if nb is None:
+                    nb = adj[v] = {}
+                if not directed:
+                    nb[u] = w
         return g
 
     def nodes(self) -> Iterable[str]:
@@ -49,6 +196,10 @@ class Graph:
 
 
 
+# Contador por proceso con token de arranque; el de-dup es por (origin, id), así que no hace falta uuid
+_MID_PREFIX = os.urandom(4).hex()
+_MID_COUNTER = itertools.count()
+
 def envelope_message(
     proto: str,
     typ: str,
@@ -56,18 +207,18 @@ def envelope_message(
     dst: str,
     ttl: int,
     payload: Any,
-    headers: Optional[list] = None,
+    headers: Optional[dict] = None,
     mid: Optional[str] = None,
 ) -> Dict[str, Any]:
 
     return {
-        "id": mid or str(uuid.uuid4()),
+        "id": mid or f"{_MID_PREFIX}-{next(_MID_COUNTER)}",
         "proto": proto,           
         "type": typ,              
         "from": src,
         "to": dst,                
         "ttl": int(ttl),
-        "headers": headers or [], 
+        "headers": headers or {}, 
         "payload": payload,
     }
 
@@ -79,9 +230,9 @@ def load_endpoints(path: str) -> Dict[str, Tuple[str, int]]:
     eps: Dict[str, Tuple[str, int]] = {}
     for k, v in raw.items():
         if isinstance(v, list) and len(v) == 2:
-            eps[str(k)] = (str(v[0]), int(v[1]))
+            eps[_intern_id(k)] = (str(v[0]), int(v[1]))
         elif isinstance(v, dict) and "host" in v and "port" in v:
-            eps[str(k)] = (str(v["host"]), int(v["port"]))
+            eps[_intern_id(k)] = (str(v["host"]), int(v["port"]))
         else:
             raise ValueError("endpoint inválido (usa ['host',port] o {'host':...,'port':...})")
     return eps
@@ -90,10 +241,14 @@ def load_endpoints(path: str) -> Dict[str, Tuple[str, int]]:
 
 class FloodingNode:
     def __init__(self, node_id: str, graph: Graph, endpoints: Dict[str, Tuple[str, int]], listen: bool = True):
-        self.node_id = node_id
+        self.node_id = _intern_id(node_id)
         self.graph = graph
         self.endpoints = endpoints        
-        self.seen: Set[Tuple[str, str]] = set()  
+        # Tabla de IDs conocidos: "from"/"to" recibidos se canonizan al objeto internado
+        self._id_table: Dict[str, str] = {n: n for n in (*graph.nodes(), *endpoints, self.node_id)}
+        self.seen = FloodingCache()
+        self._neighbor_eps: List[Tuple[str, Tuple[str, int], Optional[ctypes.Array]]] = []
+        self.refresh_neighbors()
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.listen = listen
         if self.listen:
@@ -107,40 +262,93 @@ class FloodingNode:
         t.start()
 
     def _serve(self) -> None:
+        if _libc_recvmmsg is not None:
+            self._serve_mmsg()
+            return
+        # Un único buffer para todo el loop: recvfrom_into no asigna bytes por datagrama
+        buf = bytearray(BUFFER_SIZE)
+        mv = memoryview(buf)
+        recv_into = self.sock.recvfrom_into
         while True:
-            data, _ = self.sock.recvfrom(BUFFER_SIZE)
-            try:
-                msg = json.loads(data.decode("utf-8"))
-            except Exception:
+            n, _ = recv_into(buf)
+            self._on_datagram(mv[:n])
+            if not _MSG_DONTWAIT:
                 continue
-            self._handle(msg)
+            # Drena lo que ya esté en cola sin volver a bloquear, hasta RECV_BATCH por despertar
+            for _ in range(RECV_BATCH - 1):
+                try:
+                    n, _ = recv_into(buf, 0, _MSG_DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    break
+                self._on_datagram(mv[:n])
+
+    def _serve_mmsg(self) -> None:
+        # Pool de bytearrays e iovecs reservado una vez; cada datagrama se entrega como vista, sin copia
+        bufs = [bytearray(BUFFER_SIZE) for _ in range(RECVMMSG_BATCH)]
+        views = [memoryview(b) for b in bufs]
+        iovs = (_Iovec * RECVMMSG_BATCH)()
+        hdrs = (_Mmsghdr * RECVMMSG_BATCH)()
+        for i, b in enumerate(bufs):
+            iovs[i].iov_base = ctypes.addressof((ctypes.c_char * BUFFER_SIZE).from_buffer(b))
+            iovs[i].iov_len = BUFFER_SIZE
+            hdrs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+            hdrs[i].msg_hdr.msg_iovlen = 1
+        fd = self.sock.fileno()
+        addr = ctypes.addressof(hdrs)
+        while True:
+            # MSG_WAITFORONE: bloquea hasta el primer datagrama y luego drena los ya encolados
+            n = _libc_recvmmsg(fd, addr, RECVMMSG_BATCH, MSG_WAITFORONE, None)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                raise OSError(err, "recvmmsg falló")
+            for i in range(n):
+                self._on_datagram(views[i][:hdrs[i].msg_len])
+
+    def _on_datagram(self, data: memoryview) -> None:
+        try:
+            msg = _loads(data)
+        except Exception:
+            return
+        self._handle(msg)
 
     @staticmethod
-    def _get_header(headers: list, key: str, default=None):
-        if not isinstance(headers, list):
-            return default
-        for h in headers:
-            if isinstance(h, dict) and key in h:
-                return h[key]
-        return default
+    def _as_headers(headers: Any) -> Dict[str, Any]:
+        # Compatibilidad con nodos que aún mandan headers como [{...}, ...]
+        if isinstance(headers, dict):
+            return headers
+        out: Dict[str, Any] = {}
+        if isinstance(headers, list):
+            for h in headers:
+                if isinstance(h, dict):
+                    out.update(h)
+        return out
+
+    @staticmethod
+    def _get_header(headers: Any, key: str, default=None):
+        return headers.get(key, default) if isinstance(headers, dict) else default
+
+    def _intern_node(self, s: str) -> str:
+        # Solo IDs conocidos: con setdefault la tabla crecería con cualquier valor recibido
+        return self._id_table.get(s, s)
 
     def _handle(self, msg: Dict[str, Any]) -> None:
         if not isinstance(msg, dict):
             return
         proto = msg.get("proto")
         mtype = msg.get("type")
-        origin = str(msg.get("from", ""))
+        origin = self._intern_node(str(msg.get("from", "")))
         mid = str(msg.get("id", ""))
-        dst = str(msg.get("to", ""))
+        dst = self._intern_node(str(msg.get("to", "")))
 
         if proto != "flooding":
             return
 
-        # De-dup por (origin, id)
-        key = (origin, mid)
-        if key in self.seen:
+        # De-dup por (origin, id); memoria acotada por FloodingCache. Sin id/origin se usa "?" para
+        # no descartar el mensaje (should_forward rechaza claves vacías), igual que Forwarding
+        if not self.seen.should_forward(origin or "?", mid or "?"):
             return
-        self.seen.add(key)
 
         # Entrega local 
         if dst == self.node_id or dst == "*" or mtype == "hello":
@@ -151,44 +359,42 @@ class FloodingNode:
         if ttl <= 0:
             return
 
-        last_hop = self._get_header(msg.get("headers", []), "via", default=None)
+        headers = self._as_headers(msg.get("headers"))
+        last_hop = self._get_header(headers, "via", default=None)
+        if isinstance(last_hop, str):
+            last_hop = self._intern_node(last_hop)
 
-        # Prepara copia con TTL decrementado y via = yo
-        fwd = dict(msg)
-        fwd["ttl"] = ttl
-        headers = list(msg.get("headers", []))
-        headers.append({"via": self.node_id})
-        fwd["headers"] = headers
+        # TTL decrementado y via = yo, en el mismo dict: viene del parseo y no se reutiliza después
+        msg["ttl"] = ttl
+        headers["via"] = self.node_id
+        msg["headers"] = headers
 
         # Flood a todos mis vecinos (excepto last_hop)
-        self._flood(fwd, exclude=last_hop)
+        self._flood(msg, exclude=last_hop)
 
-    def _flood(self, msg: Dict[str, Any], exclude: Optional[str] = None) -> None:
-        for neigh in self.graph.neighbors(self.node_id):
-            if neigh == exclude:
-                continue
-            ep = self.endpoints.get(neigh)
-            if not ep:
-                continue
-            host, port = ep
-            try:
-                self.sock.sendto(json.dumps(msg).encode("utf-8"), (host, port))
-            except Exception:
-                # ignora fallos puntuales de envío
-                pass
+    def refresh_neighbors(self) -> None:
+        # Vecinos con endpoint y sockaddr_in resueltos una vez; llamar de nuevo si cambian graph o endpoints
+        eps = self.endpoints
+        self._neighbor_eps = [(n, eps[n], _sockaddr_buf(eps[n])) for n in self.graph.neighbors(self.node_id) if n in eps]
+
+    def _flood(self, msg: Union[Dict[str, Any], bytes], exclude: Optional[str] = None) -> None:
+        # Se serializa una sola vez (o llega ya codificado); todos los vecinos reciben los mismos bytes
+        buf = msg if isinstance(msg, bytes) else _dumps(msg)
+        pkts = [(ep, buf, sa) for neigh, ep, sa in self._neighbor_eps if neigh != exclude]
+        _sendmmsg_batch(self.sock, pkts)
 
     def send(self, to: str, payload: Any, ttl: int = 8) -> None:
   
         ttl = max(1, int(ttl))
         msg = envelope_message("flooding", "message", self.node_id, str(to), ttl, payload)
-        msg["headers"].append({"via": self.node_id})
+        msg["headers"]["via"] = self.node_id
         self._flood(msg, exclude=None)
 
     def hello(self, ttl: int = 4) -> None:
  
         ttl = max(1, int(ttl))
         msg = envelope_message("flooding", "hello", self.node_id, "*", ttl, {"ts": time.time()})
-        msg["headers"].append({"via": self.node_id})
+        msg["headers"]["via"] = self.node_id
         self._flood(msg, exclude=None)
 
 DEBUG_FLOOD = True  
@@ -226,30 +432,87 @@ DEBUG_FLOOD = True
 #             print(f"[FLOOD/DEDUP] NEW origin={origin} id={mid} -> FORWARD")
 #         return True
 
+class RotatingBloom:
+    """Filtro de Bloom de dos generaciones; la más vieja se descarta en cada rotación (la decide quien lo usa)."""
+
+    def __init__(self, capacity: int = 10000, fpr: float = 1e-4):
+        self.capacity = int(capacity)
+        self.m = int(math.ceil(-self.capacity * math.log(fpr) / (math.log(2) ** 2)))
+        self.k = max(1, int(round(self.m / self.capacity * math.log(2))))
+        self._cur = bytearray((self.m + 7) >> 3)
+        self._old = bytearray(len(self._cur))
+
+    def indexes(self, key: str) -> List[int]:
+        # Doble hashing: k índices a partir de dos hashes de 64 bits
+        if mmh3 is not None:
+            h1, h2 = mmh3.hash64(key, signed=False)
+        else:
+            h1, h2 = struct.unpack("<QQ", hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest())
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def contains(self, key: str, idx: Optional[List[int]] = None) -> bool:
+        idx = idx or self.indexes(key)
+        cur, old = self._cur, self._old
+        return all(cur[i >> 3] & (1 << (i & 7)) for i in idx) or all(old[i >> 3] & (1 << (i & 7)) for i in idx)
+
+    def add(self, key: str, idx: Optional[List[int]] = None) -> None:
+        # Sin rotación por conteo: rotar aquí podría sacar claves que siguen vivas en el LRU.
+        # Si se satura antes de rotar solo sube la tasa de falsos positivos, que el LRU confirma.
+        cur = self._cur
+        for i in idx or self.indexes(key):
+            cur[i >> 3] |= 1 << (i & 7)
+
+    def rotate(self) -> None:
+        # Se reutiliza el buffer viejo (se limpia en sitio) en lugar de asignar uno nuevo
+        old = self._old
+        old[:] = bytes(len(old))
+        self._old, self._cur = self._cur, old
+
+
 class FloodingCache:
     def __init__(self, max_items: int = 10000, entry_ttl: float = 60.0):
-        self._seen: Dict[Tuple[str, str], float] = {}
+        # LRU: el orden de inserción coincide con el de expiración (TTL fijo y se renueva al mover al final)
+        self._seen: collections.OrderedDict[Tuple[str, str], float] = collections.OrderedDict()
         self._max = max_items
         self._ttl = entry_ttl
-
-    def _evict(self):
-        now = time.time()
-        for k, exp in list(self._seen.items()):
-            if exp < now:
-                self._seen.pop(k, None)
-        if len(self._seen) > self._max:
-            items = sorted(self._seen.items(), key=lambda kv: kv[1])
-            for k, _ in items[: len(self._seen) - self._max]:
-                self._seen.pop(k, None)
+        # Primer filtro: un negativo del Bloom evita tocar el LRU. Rota solo por tiempo, cada entry_ttl,
+        # de modo que cur+old siempre cubren toda entrada viva del LRU
+        self._bloom = RotatingBloom(capacity=max_items)
+        self._rotate_at = time.time() + entry_ttl
+
+    def _evict(self, now: float):
+        # Solo se miran las entradas más viejas, hasta la primera que sigue vigente
+        seen = self._seen
+        while seen:
+            k = next(iter(seen))
+            if seen[k] >= now:
+                break
+            seen.popitem(last=False)
 
     def should_forward(self, origin: str, mid: str) -> bool:
         if not origin or not mid:
             return False
-        self._evict()
+        now = time.time()
+        if now >= self._rotate_at:
+            self._bloom.rotate()
+            self._rotate_at = now + self._ttl
+        self._evict(now)
         key = (origin, mid)
-        if key in self._seen:
+        seen = self._seen
+        bloom = self._bloom
+        bkey = origin + "\0" + mid
+        idx = bloom.indexes(bkey)
+        if bloom.contains(bkey, idx) and key in seen:
+            seen[key] = now + self._ttl
+            seen.move_to_end(key)
+            # Se re-marca en la generación actual para que siga cubierto mientras viva en el LRU
+            bloom.add(bkey, idx)
             return False
-        self._seen[key] = time.time() + self._ttl
+        bloom.add(bkey, idx)
+        seen[key] = now + self._ttl
+        while len(seen) > self._max:
+            seen.popitem(last=False)
         return True
 
 
@@ -1,31 +1,64 @@
 from __future__ import annotations
-from typing import Dict, Callable
-import time
+from typing import Dict, Callable, Optional, Union
+import logging, time
 from .constants import *
-from .messages import hello, lsp, data
+from .messages import hello, lsp, data, as_headers
 from .flooding import FloodingCache
 
+log = logging.getLogger("fwd")
+
+_EMPTY: Dict = {}  # solo lectura: evita crear un dict vacío por cada .get("payload", {})
+
 class Forwarding:
-    def __init__(self, node_id: str, send_func: Callable[[str, Dict], None], routing):
+    def __init__(self, node_id: str, send_func: Callable[[str, Union[Dict, bytes]], None], routing,
+                 send_many_func: Optional[Callable[[list[tuple[str, Dict]]], None]] = None,
+                 encode_func: Optional[Callable[[Dict], bytes]] = None):
         self.node_id = node_id
-        self.send = send_func            
+        self.send = send_func            # acepta dict o bytes ya codificados
+        self._send_many = send_many_func
+        self._encode = encode_func
         self.routing = routing
         self.cache = FloodingCache()
         self.lsp_seq = 0
         self.last_hello_sent: dict[str,float] = {}
+        # Tupla de vecinos mantenida por Routing; solo se rehace al aparecer un vecino, no por cambios de costo
+        self._neighbors_tuple: tuple[str, ...] = ()
+        routing.on_neighbors_changed(self._set_neighbors)
+
+    def _set_neighbors(self, nbs: tuple[str, ...]):
+        self._neighbors_tuple = nbs
 
     # SALIENTES 
+    def send_many(self, items: list[tuple[str, Dict]]):
+        # Un solo envío en lote si el transporte lo soporta; si no, uno por vecino
+        if self._send_many is not None:
+            self._send_many(items)
+            return
+        for n, msg in items:
+            self.send(n, msg)
+
+    def _send_all(self, peers, msg: Dict):
+        # Mismo mensaje a varios vecinos: se codifica una sola vez
+        if self._encode is None:
+            for n in peers:
+                self.send(n, msg)
+            return
+        buf = self._encode(msg)
+        for n in peers:
+            self.send(n, buf)
+
     def send_hello_all(self, neighbors: list[str]):
         t0 = time.time()
         for n in neighbors:
             self.last_hello_sent[n] = t0
-            self.send(n, hello(self.routing.mode, self.node_id, n, t0))
+        self.send_many([(n, hello(self.routing.mode, self.node_id, n, t0)) for n in neighbors])
 
     def send_lsp_all(self, neighbors: list[str]):
         self.lsp_seq += 1
         payload_links = {n: self.routing.costs_to_neighbors.get(n, 1.0) for n in neighbors}
-        for n in neighbors:
-            self.send(n, lsp(PROTO_LSR, self.node_id, n, self.node_id, self.lsp_seq, LSP_AGE_SEC, payload_links))
+        # El LSP es el mismo para todos los vecinos: un solo envelope (to="*") codificado una vez
+        msg = lsp(PROTO_LSR, self.node_id, "*", self.node_id, self.lsp_seq, LSP_AGE_SEC, payload_links)
+        self._send_all(neighbors, msg)
 
     def send_data(self, dst: str, msg: str):
         nh = self.routing.next_hop(dst)
@@ -35,26 +68,28 @@ class Forwarding:
             return
 
         # Flooding (si estás en modo flooding o no hay ruta)
-        for n in list(self.routing.costs_to_neighbors.keys()):
-            # data(...) ya pone: to=dst y payload={"dst":dst,"msg":msg}
-            self.send(n, data(PROTO_FLOODING, self.node_id, dst, msg))
+        # data(...) ya pone: to=dst y payload={"dst":dst,"msg":msg}
+        self.send_many([(n, data(PROTO_FLOODING, self.node_id, dst, msg)) for n in self._neighbors_tuple])
 
 
     # ENTRANTES
     def on_message(self, peer: str, msg: Dict):
+        get = msg.get  # método ligado una sola vez para todas las lecturas del mensaje
         # decrementar TTL
-        ttl = msg.get("ttl", MAX_TTL)
+        ttl = get("ttl", MAX_TTL)
         ttl -= 1
         if ttl <= 0:
             return
         msg["ttl"] = ttl
 
-        mtype = msg.get("type")
-        proto = msg.get("proto")
+        mtype = get("type")
+        proto = get("proto")
+        payload = get("payload", _EMPTY)
+        pl = payload if isinstance(payload, dict) else _EMPTY
 
         if mtype == TYPE_HELLO:
             # responder/medir RTT: si trae t0, calculamos costo
-            t0 = msg.get("payload", {}).get("t0")
+            t0 = pl.get("t0")
             if isinstance(t0, (int,float)) and peer in self.routing.costs_to_neighbors:
                 rtt = max(0.1, time.time() - t0)
                 changed = self.routing.update_neighbor_cost(peer, rtt)
@@ -62,41 +97,40 @@ class Forwarding:
                     self.routing.schedule_spf()
 
         elif mtype == TYPE_INFO and proto == PROTO_LSR:
-            pl = msg.get("payload", {})
             origin = pl.get("origin")
             seq = int(pl.get("seq", 0))
             age = float(pl.get("age", LSP_AGE_SEC))
-            links = pl.get("links", {})
+            links = pl.get("links", _EMPTY)
             if self.routing.lsdb.apply_lsp(origin, seq, age, links):
                 # re-flood a todos excepto quien lo envió
-                for n in self.routing.costs_to_neighbors.keys():
-                    if n != peer:
-                        self.send(n, msg)
+                self._send_all([n for n in self._neighbors_tuple if n != peer], msg)
                 self.routing.schedule_spf()
 
         elif mtype == TYPE_DATA:
             # --- DESTINO: preferir "to"; fallback a payload.dst
-            dst_raw = msg.get("to")
+            dst_raw = get("to")
             if not dst_raw:
-                dst_raw = msg.get("payload", {}).get("dst")
+                dst_raw = pl.get("dst")
 
             # Quitar prefijo tipo "sec20.topologia2." → quedarnos con el ID "nodo7"
             dst_bare = None
             if isinstance(dst_raw, str):
                 dst_bare = dst_raw.split(".")[-1].strip()
 
-            origin = msg.get("from", "?")
-            mid = msg.get("id", "?")
-            proto = msg.get("proto", "?")
+            origin = get("from", "?")
+            mid = get("id", "?")
+            if proto is None:
+                proto = "?"
 
-            # DEBUG: usar repr para detectar espacios ocultos
-            print(f"[RX/{proto.upper()}] node={repr(self.node_id)} from={origin} dst={repr(dst_raw)} bare={repr(dst_bare)} id={mid} ttl={msg.get('ttl')} via={peer}")
+            # DEBUG: usar repr para detectar espacios ocultos; el formateo solo ocurre si el nivel está activo
+            debug = log.isEnabledFor(logging.DEBUG)
+            if debug:
+                log.debug("[RX/%s] node=%r from=%s dst=%r bare=%r id=%s ttl=%s via=%s",
+                          proto.upper(), self.node_id, origin, dst_raw, dst_bare, mid, ttl, peer)
 
             # --- ENTREGA LOCAL: destino específico (bare) o broadcast "*"
             if dst_raw == "*" or (dst_bare and dst_bare == self.node_id.strip()):
-                user_msg = msg.get("payload", {})
-                if isinstance(user_msg, dict):
-                    user_msg = user_msg.get("msg", user_msg)
+                user_msg = pl.get("msg", payload) if payload is pl else payload
                 print(f"[DATA] {origin} -> {self.node_id}: {user_msg}")
                 # si el destino es específico, detenemos aquí; si es "*", seguimos reenviando
                 if dst_raw != "*":
@@ -108,22 +142,22 @@ class Forwarding:
                 nh = self.routing.next_hop(dst_bare)
 
             if nh:
-                print(f"[FWD/NH/{self.routing.mode.upper()}] node={self.node_id} -> next-hop={nh} dst={dst_bare} id={mid}")
+                if debug:
+                    log.debug("[FWD/NH/%s] node=%s -> next-hop=%s dst=%s id=%s",
+                              self.routing.mode.upper(), self.node_id, nh, dst_bare, mid)
                 self.send(nh, msg)
                 return
 
             # --- FLOODING controlado (sin ruta): de-dup + no devolver al que lo envió
-            origin = msg.get("from", "?")
-            mid = msg.get("id", "?")
             if self.cache.should_forward(origin, mid):
-                msg_copy = dict(msg)
-                headers = list(msg_copy.get("headers", []))
-                headers.append({"via": self.node_id})
-                msg_copy["headers"] = headers
-
-                vecinos = [n for n in self.routing.costs_to_neighbors.keys() if n != peer]
-                print(f"[FWD/FLOOD] node={self.node_id} -> vecinos={vecinos} dst={dst_bare} id={mid}")
-                for n in vecinos:
-                    self.send(n, msg_copy)
-            else:
-                print(f"[FWD/FLOOD] node={self.node_id} DUP -> NO reenviar id={mid}")
+                # Se modifica en sitio (como el TTL arriba): el dict viene del decode del adaptador
+                headers = as_headers(get("headers"))
+                headers["via"] = self.node_id
+                msg["headers"] = headers
+
+                vecinos = [n for n in self._neighbors_tuple if n != peer]
+                if debug:
+                    log.debug("[FWD/FLOOD] node=%s -> vecinos=%s dst=%s id=%s", self.node_id, vecinos, dst_bare, mid)
+                self._send_all(vecinos, msg)
+            elif debug:
+                log.debug("[FWD/FLOOD] node=%s DUP -> NO reenviar id=%s", self.node_id, mid)
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Dict, Set
+from array import array
+from typing import Dict, Set, Tuple
 
 
 class Graph:
@@ -12,9 +13,48 @@ class Graph:
         self.adj.setdefault(v, {})[u] = w
 
 
+    def remove_link(self, u: str, v: str):
+        # Quita la arista en ambos sentidos; un nodo sin vecinos desaparece del grafo
+        for a, b in ((u, v), (v, u)):
+            nb = self.adj.get(a)
+            if nb is not None:
+                nb.pop(b, None)
+                if not nb:
+                    del self.adj[a]
+
+
+    def with_links(self, u: str, links: Dict[str, float]) -> "Graph":
+        # Copia con los enlaces de u sobrescritos; solo se duplican las filas tocadas, este grafo no cambia
+        g = Graph()
+        adj = dict(self.adj)
+        if links:
+            mine = dict(adj.get(u, {}))
+            for v, w in links.items():
+                mine[v] = w
+                row = dict(adj.get(v, {}))
+                row[u] = w
+                adj[v] = row
+            adj[u] = mine
+        g.adj = adj
+        return g
+
+
     def neighbors(self, u: str) -> Dict[str, float]:
         return self.adj.get(u, {})
 
 
     def nodes(self) -> Set[str]:
-        return set(self.adj.keys())
\ No newline at end of file
+        return set(self.adj.keys())
+
+
+    def to_csr(self) -> Tuple[array, array, array, Dict[str, int]]:
+        # (indptr, indices, weights, node_index); los vecinos de u son indices[indptr[i]:indptr[i+1]]
+        node_index = {u: i for i, u in enumerate(self.adj)}
+        indptr = array("i", [0])
+        indices = array("i")
+        weights = array("d")
+        for nb in self.adj.values():
+            indices.extend(node_index[v] for v in nb)
+            weights.extend(nb.values())
+            indptr.append(len(indices))
+        return indptr, indices, weights, node_index
\ No newline at end of file
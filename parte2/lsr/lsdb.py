@@ -1,36 +1,87 @@
 from __future__ import annotations
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Optional
 from .graph import Graph
 from .constants import LSP_AGE_SEC
-import time
+import itertools, threading, time
+
+_NO_LINKS: Dict[str, float] = {}
 
 
 class LSDB:
     def __init__(self):
-        self.db: Dict[str, tuple[int, float, dict[str,float]]] = {}
+        # Columnas separadas por origen: sweep solo recorre las expiraciones
+        self._seq: Dict[str, int] = {}
+        self._exp: Dict[str, float] = {}
+        self._links: Dict[str, dict[str,float]] = {}
+        # Grafo persistente, actualizado por diferencias en apply_lsp/sweep
+        self._graph = Graph()
+        # Orden en que se vio la primera LSP de cada origen; las LSP posteriores no lo refrescan.
+        # Si dos orígenes anuncian la misma arista gana el que apareció después (igual que el orden de inserción del rebuild original)
+        self._order: Dict[str, int] = {}
+        self._tick = itertools.count()
+        # apply_lsp llega desde el hilo del adaptador y el SPF corre en el periódico: el grafo vivo se comparte
+        self.lock = threading.Lock()
+        # Sube solo cuando cambia alguna arista; una LSP que solo renueva seq/edad no la toca
+        self.version = 0
+
+
+    def _edge_weight(self, u: str, v: str) -> Optional[float]:
+        wu = self._links.get(u, _NO_LINKS).get(v)
+        wv = self._links.get(v, _NO_LINKS).get(u)
+        if wu is None:
+            return wv
+        if wv is None:
+            return wu
+        return wu if self._order[u] > self._order[v] else wv
+
+
+    def _sync_edges(self, origin: str, neighbors: Iterable[str]):
+        g = self._graph
+        for n in neighbors:
+            w = self._edge_weight(origin, n)
+            if w == g.adj.get(origin, _NO_LINKS).get(n):
+                continue
+            if w is None:
+                g.remove_link(origin, n)
+            else:
+                g.add_link(origin, n, w)
+            self.version += 1
 
 
     def apply_lsp(self, origin: str, seq: int, age: float, links: dict[str,float]) -> bool:
         now = time.time()
         expires = now + min(age, LSP_AGE_SEC)
-        cur = self.db.get(origin)
-        if cur is None or seq > cur[0]:
-            self.db[origin] = (seq, expires, links)
+        with self.lock:
+            return self._apply(origin, seq, expires, links)
+
+
+    def _apply(self, origin: str, seq: int, expires: float, links: dict[str,float]) -> bool:
+        cur = self._seq.get(origin)
+        if cur is None or seq > cur:
+            old = self._links.get(origin, _NO_LINKS)
+            self._seq[origin] = seq
+            self._exp[origin] = expires
+            self._links[origin] = links
+            if origin not in self._order:
+                self._order[origin] = next(self._tick)
+            self._sync_edges(origin, old.keys() | links.keys())
             return True
         return False
 
 
     def sweep(self) -> bool:
         now = time.time()
-        rm = [o for o,(seq,exp,_) in self.db.items() if exp < now]
-        for o in rm:
-            del self.db[o]
+        with self.lock:
+            rm = [o for o, exp in self._exp.items() if exp < now]
+            for o in rm:
+                del self._seq[o]
+                del self._exp[o]
+                old = self._links.pop(o)
+                del self._order[o]
+                self._sync_edges(o, old)
         return bool(rm)
 
 
     def to_graph(self) -> Graph:
-        g = Graph()
-        for origin, (_,_,links) in self.db.items():
-            for n,c in links.items():
-                g.add_link(origin, n, c)
-        return g
\ No newline at end of file
+        # Grafo vivo del LSDB: no modificarlo desde fuera (ver Graph.with_links)
+        return self._graph
\ No newline at end of file
@@ -1,8 +1,29 @@
 from __future__ import annotations
-import json, uuid
+import itertools, json, os
 from typing import Any, Dict, Optional
 from .constants import MAX_TTL
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    # Encoder/decoder reutilizados: json.dumps con kwargs crea un JSONEncoder nuevo por llamada
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    _decoder = json.JSONDecoder()
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8")
+        return _decoder.decode(data)
+
 
 # Formato JSON del lab
 # {
@@ -11,20 +32,45 @@ from .constants import MAX_TTL
 # "from": "nodeA",
 # "to": "nodeB|*",
 # "ttl": 5,
-# "headers": [{...}],
+# "headers": {"via": "nodeX", ...},
 # "payload": "..."
 # }
 
 
-def base(proto: str, mtype: str, src: str, dst: str, payload: Any, ttl: int = MAX_TTL, headers: Optional[list] = None) -> Dict[str, Any]:
+# IDs de mensaje: prefijo de nodo + contador; el de-dup ya se hace por (origin, id).
+# El token de arranque evita chocar con IDs de una ejecución anterior del mismo nodo.
+_BOOT = os.urandom(4).hex()
+_NODE_PREFIX = _BOOT
+_MID_COUNTER = itertools.count()
+
+
+def set_node_prefix(node_id: str) -> None:
+    global _NODE_PREFIX
+    _NODE_PREFIX = f"{node_id}-{_BOOT}"
+
+
+def as_headers(headers: Any) -> Dict[str, Any]:
+    # headers viaja como dict; una lista de dicts (formato anterior) se convierte una vez al recibir
+    if isinstance(headers, dict):
+        return headers
+    if isinstance(headers, list):
+        out: Dict[str, Any] = {}
+        for h in headers:
+            if isinstance(h, dict):
+                out.update(h)
+        return out
+    return {}
+
+
+def base(proto: str, mtype: str, src: str, dst: str, payload: Any, ttl: int = MAX_TTL, headers: Optional[dict] = None) -> Dict[str, Any]:
     return {
-    "id": str(uuid.uuid4()),
+    "id": f"{_NODE_PREFIX}-{next(_MID_COUNTER)}",
     "proto": proto,
     "type": mtype,
     "from": src,
     "to": dst,
     "ttl": ttl,
-    "headers": headers or [],
+    "headers": headers or {},
     "payload": payload,
     }
 
@@ -66,8 +112,8 @@ def data(proto: str, src: str, dst_node: str, msg: str) -> Dict[str, Any]:
 
 
 def encode(msg: Dict[str, Any]) -> bytes:
-    return (json.dumps(msg) + "\n").encode("utf-8")
+    return dumps(msg) + b"\n"
 
 
 def decode(line: bytes) -> Dict[str, Any]:
-    return json.loads(line.decode("utf-8").strip())
\ No newline at end of file
+    return loads(line)
\ No newline at end of file
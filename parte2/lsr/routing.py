@@ -1,7 +1,7 @@
 from __future__ import annotations
 import time, threading
-from typing import Dict
-from .constants import PROTO_DIJKSTRA, PROTO_FLOODING, PROTO_LSR, SPF_DEBOUNCE_SEC
+from typing import Callable, Dict, List
+from .constants import PROTO_DIJKSTRA, PROTO_LSR, SPF_DEBOUNCE_SEC
 from .dijkstra import shortest_paths
 from .lsdb import LSDB
 
@@ -11,19 +11,37 @@ class Routing:
         self.node_id = node_id
         self.mode = PROTO_LSR 
         self.table: Dict[str,str] = {} 
+        # Tabla consultada por next_hop: vacía en flooding, self.table en LSR/Dijkstra
+        self._active_table: Dict[str,str] = self.table
         self.costs_to_neighbors: Dict[str,float] = {} 
+        self.topology_version = 0  # se incrementa con cada cambio en costs_to_neighbors
+        self._neighbor_listeners: List[Callable[[tuple], None]] = []
         self.lsdb = LSDB()
         self._spf_lock = threading.Lock()
         self._spf_deadline = 0.0
+        self._last_spf_fingerprint = None
 
 
     def set_mode(self, mode: str):
         self.mode = mode
+        self._active_table = self.table if mode in (PROTO_DIJKSTRA, PROTO_LSR) else {}
+
+
+    def on_neighbors_changed(self, cb: Callable[[tuple], None]):
+        # cb recibe la tupla de vecinos actual ahora y cada vez que cambia el conjunto (no el costo)
+        self._neighbor_listeners.append(cb)
+        cb(tuple(self.costs_to_neighbors))
 
 
     def update_neighbor_cost(self, n: str, cost: float) -> bool:
         old = self.costs_to_neighbors.get(n)
         self.costs_to_neighbors[n] = cost
+        if old != cost:
+            self.topology_version += 1
+        if old is None and self._neighbor_listeners:
+            nbs = tuple(self.costs_to_neighbors)
+            for cb in self._neighbor_listeners:
+                cb(nbs)
         return old != cost
 
 
@@ -38,21 +56,21 @@ class Routing:
                 self._spf_deadline = 0.0
             else:
                 return
+        # Sin cambios en aristas del LSDB ni en costos a vecinos el resultado sería el mismo
+        fp = (self.lsdb.version, self.topology_version)
+        if fp == self._last_spf_fingerprint:
+            return
         # Ejecutar SPF
-        g = self.lsdb.to_graph()
-        for n,c in self.costs_to_neighbors.items():
-            g.add_link(self.node_id, n, c)
-        dist, prev, nh = shortest_paths(g, self.node_id)
+        with self.lsdb.lock:
+            g = self.lsdb.to_graph().with_links(self.node_id, self.costs_to_neighbors)
+            dist, prev, nh = shortest_paths(g, self.node_id)
         # construir FIB/tabla
         new_table = {dst: hop for dst, hop in nh.items() if dst != self.node_id}
         self.table = new_table
+        if self.mode in (PROTO_DIJKSTRA, PROTO_LSR):
+            self._active_table = new_table
+        self._last_spf_fingerprint = fp
 
 
     def next_hop(self, dst: str) -> str | None:
-        if self.mode == PROTO_FLOODING:
-            return None
-        if self.mode == PROTO_DIJKSTRA and dst in self.table:
-            return self.table[dst]
-        if self.mode == PROTO_LSR and dst in self.table:
-            return self.table[dst]
-        return None
\ No newline at end of file
+        return self._active_table.get(dst)
\ No newline at end of file
@@ -1,10 +1,10 @@
 from __future__ import annotations
-import argparse, json, time, threading, sys
+import argparse, json, logging, time, threading, sys
 from lsr.constants import *
 from lsr.routing import Routing
 from lsr.forwarding import Forwarding
 from lsr.adapters.sockets import SocketAdapter
-from lsr.messages import data
+from lsr.messages import data, set_node_prefix
 from lsr.adapters.sockets import SocketAdapter
 from lsr.adapters.redis_pubsub import RedisPubSubAdapter
 
@@ -19,6 +19,7 @@ parser.add_argument("--listen", required=True, help="host:port")
 parser.add_argument("--peers", default="", help="lista host:port separados por coma EN ORDEN de los vecinos del archivo topo para este nodo")
 
 parser.add_argument("--transport", choices=["sockets", "redis"], default="sockets")
+parser.add_argument("--debug", action="store_true", help="Mostrar trazas [RX/...] y [FWD/...] del forwarding")
 
 # Redis settings 
 parser.add_argument("--redis-host", default="lab3.redesuvg.cloud")
@@ -30,7 +31,10 @@ parser.add_argument("--channel-prefix", default="sec20.topologia1")
 
 args = parser.parse_args()
 
+logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO, format="%(message)s")
+
 node_id = args.node
+set_node_prefix(node_id)
 
 # Cargar config
 with open(args.config_topo, "r", encoding="utf-8") as f:
@@ -61,18 +65,30 @@ forwarding = None
 # Función de envío 
 adapter = None
 
-def _send(peer_id, msg_dict):
+def _to_wire(msg_dict):
     try:
         if args.transport == "redis":
             to_field = msg_dict.get("to")
-            if isinstance(to_field, str) and "." not in to_field:
+            if isinstance(to_field, str) and "." not in to_field and to_field != "*":
                 msg_dict = dict(msg_dict)  # evita mutar el original por si se reusa
                 msg_dict["to"] = f"{args.channel_prefix}.{to_field}".rstrip(".")
     except Exception:
         pass
-    adapter.send(peer_id, msg_dict)
+    return msg_dict
+
+def _send(peer_id, msg):
+    if isinstance(msg, bytes):
+        adapter.send_bytes(peer_id, msg)  # ya pasó por _encode
+    else:
+        adapter.send(peer_id, _to_wire(msg))
+
+def _send_many(items):
+    adapter.send_many([(peer_id, _to_wire(msg_dict)) for peer_id, msg_dict in items])
+
+def _encode(msg_dict):
+    return adapter.encode(_to_wire(msg_dict))
 
-forwarding = Forwarding(node_id, _send, routing)
+forwarding = Forwarding(node_id, _send, routing, send_many_func=_send_many, encode_func=_encode)
 
 # Selección de transporte 
 if args.transport == "sockets":